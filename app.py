@@ -3,10 +3,14 @@
 美容室顧客データリピート分析システム - メインアプリケーション
 """
 
+import hashlib
+import io
 import os
-import pickle
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
+from flask_caching import Cache
 from werkzeug.utils import secure_filename
 import pandas as pd
 import json
@@ -19,127 +23,318 @@ from modules.data_processor import DataProcessor
 from modules.repeat_analyzer import RepeatAnalyzer
 from modules.visualization import DashboardVisualizer
 from modules.report_generator import ReportGenerator
+from modules.frame_store import serialize_dataframe, deserialize_dataframe
+from modules.json_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_secret_key_for_local_flask_run')
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['PROCESSED_DATA_FOLDER'] = 'processed_data'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 
+# 処理済みデータ・分析結果のキャッシュ設定
+# デフォルトはプロセス内メモリ (SimpleCache)。複数ワーカーで共有する場合は
+# CACHE_TYPE=RedisCache / MemcachedCache と接続先 (CACHE_REDIS_URL など) を環境変数で指定する。
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+app.config['CACHE_DEFAULT_TIMEOUT'] = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 3600))  # 1時間
+# SimpleCacheは各ワーカーのメモリに保持されるため、処理済みデータ (100MBのCSVで10MB程度) が
+# 溜まりすぎないよう保持件数を抑える (処理済みデータ・分析結果などキーの種類を問わない件数)
+app.config['CACHE_THRESHOLD'] = int(os.environ.get('CACHE_THRESHOLD', 30))  # SimpleCacheの最大保持件数
+app.config['CACHE_KEY_PREFIX'] = 'hpb_repeat_'
+if os.environ.get('CACHE_REDIS_URL'):
+    app.config['CACHE_REDIS_URL'] = os.environ['CACHE_REDIS_URL']
+if os.environ.get('CACHE_MEMCACHED_SERVERS'):
+    app.config['CACHE_MEMCACHED_SERVERS'] = os.environ['CACHE_MEMCACHED_SERVERS'].split(',')
+cache = Cache(app)
+
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 
-# アップロードフォルダと処理済みデータフォルダを作成
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_DATA_FOLDER'], exist_ok=True)
+# CSVの読み込み・処理をリクエストから切り離して実行するバックグラウンドワーカー
+# /upload はファイル保存後すぐに応答し、クライアントは /upload/status/<task_id> で完了を確認する
+ingest_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('INGEST_WORKERS', 2)),
+                                     thread_name_prefix='csv-ingest')
 
-def cleanup_session_files():
-    """セッションに関連する一時ファイルを削除する"""
-    paths_to_clean = ['processed_data_path', 'analysis_results_path']
-    for key in paths_to_clean:
-        file_path = session.get(key)
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                app.logger.info(f"古い一時ファイルを削除しました: {file_path} (key: {key})")
-            except OSError as e:
-                app.logger.error(f"一時ファイルの削除に失敗しました: {file_path},エラー: {e}")
+def analysis_cache_keys(analysis_id):
+    """分析IDから分析結果・分析パラメータのキャッシュキーを組み立てる"""
+    return f"results:{analysis_id}", f"params:{analysis_id}"
+
+def analysis_id_for(processed_data_key, analysis_parameters):
+    """
+    処理済みデータのキーと分析パラメータからblake2bのハッシュ値で分析IDを求める
+
+    同じデータ・同じパラメータの分析は同じIDになるため、再分析時や他のセッションでも結果を再利用できる。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(processed_data_key.encode('utf-8'))
+    digest.update(json.dumps(analysis_parameters, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+# 分析IDは (処理済みデータ, パラメータ) のハッシュ値のため、同じIDの分析結果・ダッシュボード用データは変わらない。
+# 画面表示やレポート生成のたびに共有キャッシュから取り出して (デシリアライズして) いたものを、
+# 直近の分析ID分だけプロセス内にも保持する
+ANALYSIS_LRU_SIZE = int(os.environ.get('ANALYSIS_LRU_SIZE', 8))
+
+@lru_cache(maxsize=ANALYSIS_LRU_SIZE)
+def load_analysis(analysis_id):
+    """
+    分析IDに対応する (分析結果, 分析パラメータ) を返す
+
+    キャッシュにない場合は KeyError を送出する (見つからなかった結果はプロセス内に保持しない)。
+    """
+    results_key, params_key = analysis_cache_keys(analysis_id)
+    analysis_results, analysis_parameters = cache.get_many(results_key, params_key)
+    if analysis_results is None or analysis_parameters is None:
+        raise KeyError(analysis_id)
+    return analysis_results, analysis_parameters
+
+def load_analysis_from_cache():
+    """セッションの分析IDから (分析結果, 分析パラメータ) を取得する (ない場合は (None, None))"""
+    analysis_id = session.get('analysis_id')
+    if not analysis_id:
+        return None, None
+    try:
+        return load_analysis(analysis_id)
+    except KeyError:
+        return None, None
+
+@lru_cache(maxsize=ANALYSIS_LRU_SIZE)
+def load_dashboard_data(analysis_id):
+    """
+    分析IDに対応するダッシュボード表示用データを返す
+
+    キャッシュに分析結果がない場合は KeyError を送出する (見つからなかった結果はプロセス内に保持しない)。
+    """
+    dashboard_data = build_dashboard_data(analysis_id)
+    if dashboard_data is None:
+        raise KeyError(analysis_id)
+    return dashboard_data
+
+def load_dashboard_data_from_session():
+    """セッションの分析IDからダッシュボード表示用データを取得する (ない場合は None)"""
+    analysis_id = session.get('analysis_id')
+    if not analysis_id:
+        return None
+    try:
+        return load_dashboard_data(analysis_id)
+    except KeyError:
+        return None
+
+@lru_cache(maxsize=ANALYSIS_LRU_SIZE)
+def load_repeat_data(processed_data_key, new_customer_start, new_customer_end, repeat_analysis_end):
+    """
+    処理済みデータと期間の指定に対応する (新規顧客データ, リピートデータ) を返す
+
+    分析のうち重い新規顧客抽出・リピート集計は期間の指定だけで決まるため、直近の条件分だけプロセス内に保持し、
+    基準回数・最低顧客数だけを変えた再分析では集計部分のみを実行する。
+    処理済みデータがキャッシュにない場合は KeyError を送出する。
+    """
+    raw_data_bytes = cache.get(processed_data_key)
+    if raw_data_bytes is None:
+        raise KeyError(processed_data_key)
+    return RepeatAnalyzer().extract_repeat_data(
+        deserialize_dataframe(raw_data_bytes),
+        new_customer_start,
+        new_customer_end,
+        repeat_analysis_end
+    )
+
+@cache.memoize(timeout=1800)
+def build_dashboard_data(analysis_id):
+    """
+    分析IDに対応する分析結果からダッシュボード表示用データを生成する
+
+    分析結果は次の /analyze まで変わらないため、分析IDごとにメモ化して再表示時の再生成を省く。
+    分析結果がキャッシュにない場合は None を返す。
+    """
+    results_key, _ = analysis_cache_keys(analysis_id)
+    analysis_results = cache.get(results_key)
+    if analysis_results is None:
+        return None
+    return DashboardVisualizer().generate_dashboard_data(analysis_results)
 
 @app.route('/')
 def index():
     """メインページ - ファイルアップロードと設定画面"""
-    cleanup_session_files()
-    session.pop('processed_data_path', None)
-    session.pop('analysis_results_path', None)
+    # 処理済みデータは大きいため、前回アップロード分をキャッシュから削除する
+    # (分析結果は分析IDで共有されるため、キャッシュの保持期間 CACHE_DEFAULT_TIMEOUT に任せる)
+    release_processed_data()
+    session.pop('upload_task_id', None)
+    session.pop('analysis_id', None)
     session.pop('min_date', None)
     session.pop('max_date', None)
-    session.pop('analysis_parameters', None)
     session.pop('analysis_performed', None)
     return render_template('index.html')
 
+def upload_task_key(task_id):
+    """アップロード処理タスクの状態を保持するキャッシュキー"""
+    return f"upload_task:{task_id}"
+
+def processed_cache_keys(content_hash):
+    """CSVの内容ハッシュから処理済みデータ・そのメタ情報のキャッシュキーを組み立てる"""
+    return f"processed:{content_hash}", f"processed_meta:{content_hash}"
+
+def release_processed_data(keep_key=None):
+    """
+    セッションに紐づく処理済みデータとそのメタ情報をキャッシュから削除する
+
+    同じ内容の再アップロードでは同じキーを使い続けるため、keep_key と同じキーは削除しない。
+    """
+    processed_data_key = session.pop('processed_data_key', None)
+    if not processed_data_key or processed_data_key == keep_key:
+        return
+    content_hash = processed_data_key.split(':', 1)[1]
+    cache.delete_many(*processed_cache_keys(content_hash))
+    app.logger.info(f"前回の処理済みデータをキャッシュから削除しました: {processed_data_key}")
+
+def hash_csv_files(csv_files):
+    """アップロードされたCSVの内容 (ファイル順) からblake2bのハッシュ値を求める"""
+    digest = hashlib.blake2b(digest_size=16)
+    for _, content in csv_files:
+        # ファイルの区切りが変わっても同じハッシュにならないよう、長さも含める
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    return digest.hexdigest()
+
+def bind_processed_data(processed_data_key, meta):
+    """処理済みデータをセッションに紐づけ、アップロード完了のレスポンス内容を返す"""
+    session['processed_data_key'] = processed_data_key
+    session['min_date'] = meta['min_date']
+    session['max_date'] = meta['max_date']
+    session['analysis_performed'] = False # 分析はまだ実行されていない
+    return {
+        'success': True,
+        'state': 'done',
+        'message': f"{meta['file_count']}個のCSVファイルを読み込み、処理しました",
+        'total_records': meta['total_records'],
+        'min_date': meta['min_date'],
+        'max_date': meta['max_date']
+    }
+
+def ingest_csv_files(task_id, content_hash, csv_files):
+    """
+    バックグラウンドでCSVファイルを読み込み・処理し、結果をキャッシュに保存する
+
+    csv_files は (ファイル名, ファイル内容のバイト列) のリスト。
+    処理済みデータは内容ハッシュをキーに保存し、同じ内容の再アップロードで再利用する。
+    処理状態は upload_task:<task_id> に pending → running → done / error の順で記録する。
+    """
+    status_key = upload_task_key(task_id)
+    processed_data_key, meta_key = processed_cache_keys(content_hash)
+    with app.app_context():
+        cache.set(status_key, {'state': 'running'})
+        try:
+            processor = DataProcessor()
+            combined_data = processor.load_and_combine_csv_files(csv_files)
+            # 日付範囲は読み込み時の来店日パースと同時に算出済み
+            min_date, max_date = processor.date_range
+
+            # 分析に使うカラムだけに絞り込み、(顧客ID, 来店日) 順に並べ替えてから
+            # Arrow IPC形式でキャッシュに保存 (分析のたびの並べ替えを省く)
+            analyzer = RepeatAnalyzer()
+            analysis_data = analyzer.sort_visits(analyzer.select_analysis_columns(combined_data))
+            meta = {
+                'file_count': len(csv_files),
+                'total_records': len(combined_data),
+                'min_date': min_date,
+                'max_date': max_date
+            }
+            # 保存に失敗した場合 (Memcachedの項目サイズ上限を超えた場合など) は完了扱いにせず、エラーとして通知する
+            stored = cache.set(processed_data_key, serialize_dataframe(analysis_data))
+            stored = stored and cache.set(meta_key, meta)
+            if not stored:
+                app.logger.error(f"処理済みデータをキャッシュに保存できませんでした (task_id={task_id}, key={processed_data_key})")
+                cache.set(status_key, {
+                    'state': 'error',
+                    'error': '処理済みデータを保存できませんでした。データ量が大きすぎる可能性があります。'
+                })
+                return
+
+            cache.set(status_key, {'state': 'done', 'processed_data_key': processed_data_key, **meta})
+        except Exception as e:
+            app.logger.error(f"ファイル処理エラー (task_id={task_id}): {traceback.format_exc()}")
+            cache.set(status_key, {'state': 'error', 'error': f'ファイル処理エラーが発生しました: {str(e)}'})
+
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    """CSVファイルのアップロード処理"""
+    """CSVファイルのアップロード処理 (読み込み・処理はバックグラウンドで実行)"""
     try:
-        # 古い一時ファイルがあれば削除 (念のため)
-        cleanup_session_files()
-
         uploaded_files = request.files.getlist('csv_files')
         if not uploaded_files or not uploaded_files[0].filename:
             return jsonify({'error': 'ファイルが選択されていません'}), 400
         
-        file_paths = []
+        # アップロードされたCSVはディスクに保存せず、内容をそのままpyarrowのCSVリーダーに渡す
+        # (リクエスト終了後はストリームを読めないため、ここでバイト列として取り出しておく)
+        csv_files = []
         for file_in in uploaded_files: # file変数名がsend_fileと衝突するため変更
             if file_in and file_in.filename.endswith('.csv'):
                 filename = secure_filename(file_in.filename)
-                # オリジナルのアップロードファイルはセッション間で共有される可能性があるため、
-                # UPLOAD_FOLDERもセッションごとに管理するか、毎回上書きを許容する設計とする。
-                # ここでは後者のシンプルなアプローチを採用。
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file_in.save(file_path)
-                file_paths.append(file_path)
+                csv_files.append((filename, file_in.read()))
         
-        if not file_paths:
+        if not csv_files:
             return jsonify({'error': 'CSVファイルがありません'}), 400
-        
-        processor = DataProcessor()
-        combined_data = processor.load_and_combine_csv_files(file_paths)
-        min_date, max_date = processor.get_date_range(combined_data)
-        
-        # 処理済みデータを一時ファイルに保存
-        processed_filename = f"{uuid.uuid4().hex}.pkl"
-        processed_data_path = os.path.join(app.config['PROCESSED_DATA_FOLDER'], processed_filename)
-        with open(processed_data_path, 'wb') as f:
-            pickle.dump(combined_data, f)
-            
-        # 元のアップロードファイルを削除
-        for p in file_paths:
-            try:
-                if os.path.exists(p):
-                    os.remove(p)
-                    app.logger.info(f"アップロードされたCSVファイルを削除しました: {p}")
-            except OSError as e:
-                app.logger.error(f"アップロードされたCSVファイルの削除に失敗しました: {p}, エラー: {e}")
-            
-        session['processed_data_path'] = processed_data_path
-        session['min_date'] = min_date
-        session['max_date'] = max_date
-        session['analysis_performed'] = False # 分析はまだ実行されていない
 
-        # アップロード成功時に analysis_results_path が残っていればクリア
-        if session.get('analysis_results_path'):
-            if os.path.exists(session['analysis_results_path']):
-                try:
-                    os.remove(session['analysis_results_path'])
-                    app.logger.info(f"アップロード時に古い分析結果ファイルを削除: {session['analysis_results_path']}")
-                except OSError as e:
-                    app.logger.error(f"アップロード時の古い分析結果ファイル削除失敗: {session['analysis_results_path']}, エラー: {e}")
-            session.pop('analysis_results_path', None)
+        session.pop('upload_task_id', None)
+        session.pop('analysis_id', None)
+
+        # 同じ内容のCSVが処理済みであれば、再パースせずにその結果を使う
+        content_hash = hash_csv_files(csv_files)
+        processed_data_key, meta_key = processed_cache_keys(content_hash)
+        release_processed_data(keep_key=processed_data_key)
+        meta = cache.get(meta_key)
+        if meta is not None and cache.has(processed_data_key):
+            app.logger.info(f"処理済みのCSVと同じ内容のため、キャッシュを再利用します: {processed_data_key}")
+            return jsonify(bind_processed_data(processed_data_key, meta))
+
+        task_id = uuid.uuid4().hex
+        cache.set(upload_task_key(task_id), {'state': 'pending'})
+        ingest_executor.submit(ingest_csv_files, task_id, content_hash, csv_files)
+
+        session['upload_task_id'] = task_id
+        session['analysis_performed'] = False # 分析はまだ実行されていない
 
         return jsonify({
             'success': True,
-            'message': f'{len(file_paths)}個のCSVファイルを読み込み、処理しました',
-            'total_records': len(combined_data),
-            'min_date': min_date,
-            'max_date': max_date
-        })
+            'state': 'pending',
+            'task_id': task_id,
+            'status_url': url_for('upload_status', task_id=task_id),
+            'message': f'{len(csv_files)}個のCSVファイルを受け付けました。処理しています...'
+        }), 202
     
     except Exception as e:
         app.logger.error(f"ファイルアップロードエラー: {traceback.format_exc()}")
         return jsonify({'error': f'ファイル処理エラーが発生しました: {str(e)}'}), 500
 
+@app.route('/upload/status/<task_id>')
+def upload_status(task_id):
+    """アップロードされたCSVファイルの処理状況を返す (完了時に処理済みデータをセッションに紐づける)"""
+    if session.get('upload_task_id') != task_id:
+        return jsonify({'error': '指定されたアップロード処理が見つかりません'}), 404
+
+    status = cache.get(upload_task_key(task_id))
+    if status is None:
+        session.pop('upload_task_id', None)
+        return jsonify({'error': 'アップロード処理の状態が見つかりません。ファイルを再アップロードしてください。'}), 404
+
+    if status['state'] in ('pending', 'running'):
+        return jsonify({'state': status['state'], 'task_id': task_id})
+
+    cache.delete(upload_task_key(task_id))
+    session.pop('upload_task_id', None)
+
+    if status['state'] == 'error':
+        return jsonify({'state': 'error', 'error': status['error']}), 500
+
+    return jsonify(bind_processed_data(status['processed_data_key'], status))
+
 @app.route('/analyze', methods=['POST'])
 def analyze_data():
     """リピート分析実行"""
     try:
-        processed_data_path = session.get('processed_data_path')
-        if not processed_data_path or not os.path.exists(processed_data_path):
+        processed_data_key = session.get('processed_data_key')
+        if not processed_data_key:
             app.logger.error("分析試行: 処理済みデータが見つかりません。")
             return jsonify({'error': '処理済みのデータが見つかりません。ファイルを再アップロードしてください。'}), 400
 
-        with open(processed_data_path, 'rb') as f:
-            raw_data = pickle.load(f)
-
         # リクエストパラメータ取得
         new_customer_start = request.json.get('new_customer_start')
         new_customer_end = request.json.get('new_customer_end')
@@ -155,27 +350,7 @@ def analyze_data():
         min_stylist_customers = int(request.json.get('min_stylist_customers', 10))
         min_coupon_customers = int(request.json.get('min_coupon_customers', 5))
         
-        analyzer = RepeatAnalyzer()
-        analysis_results_data = analyzer.analyze_repeat_customers(
-            raw_data,
-            new_customer_start,
-            new_customer_end,
-            repeat_analysis_end,
-            min_repeat_count=min_repeat_count,
-            min_stylist_customers=min_stylist_customers,
-            min_coupon_customers=min_coupon_customers,
-            target_rates=TARGET_RATES
-        )
-        
-        # 分析結果を一時ファイルに保存
-        analysis_results_filename = f"{uuid.uuid4().hex}_analysis.pkl"
-        analysis_results_path = os.path.join(app.config['PROCESSED_DATA_FOLDER'], analysis_results_filename)
-        with open(analysis_results_path, 'wb') as f:
-            pickle.dump(analysis_results_data, f)
-            
-        session['analysis_results_path'] = analysis_results_path
-        
-        session['analysis_parameters'] = {
+        analysis_parameters = {
             'new_customer_start': new_customer_start,
             'new_customer_end': new_customer_end,
             'repeat_analysis_end': repeat_analysis_end,
@@ -184,6 +359,37 @@ def analyze_data():
             'min_coupon_customers': min_coupon_customers,
             'target_rates': TARGET_RATES
         }
+
+        # 分析結果とパラメータは (処理済みデータ, パラメータ) から求めた分析IDをキーにキャッシュへ保存する
+        # 同じ条件の分析結果がキャッシュにあれば再計算しない。セッション (Cookie) には分析IDのみを持たせる
+        analysis_id = analysis_id_for(processed_data_key, analysis_parameters)
+        results_key, params_key = analysis_cache_keys(analysis_id)
+        if cache.has(results_key) and cache.has(params_key):
+            app.logger.info(f"同じ条件の分析結果がキャッシュにあるため再利用します: analysis_id={analysis_id}")
+        else:
+            try:
+                new_customers, repeat_data = load_repeat_data(
+                    processed_data_key, new_customer_start, new_customer_end, repeat_analysis_end
+                )
+            except KeyError:
+                app.logger.error("分析試行: 処理済みデータが見つかりません。")
+                return jsonify({'error': '処理済みのデータが見つかりません。ファイルを再アップロードしてください。'}), 400
+
+            analyzer = RepeatAnalyzer()
+            analysis_results_data = analyzer.summarize_repeat_data(
+                new_customers,
+                repeat_data,
+                new_customer_start,
+                new_customer_end,
+                repeat_analysis_end,
+                min_repeat_count=min_repeat_count,
+                min_stylist_customers=min_stylist_customers,
+                min_coupon_customers=min_coupon_customers,
+                target_rates=TARGET_RATES
+            )
+            cache.set_many({results_key: analysis_results_data, params_key: analysis_parameters})
+
+        session['analysis_id'] = analysis_id
         session['analysis_performed'] = True
         
         return jsonify({
@@ -204,19 +410,14 @@ def dashboard():
         return redirect(url_for('index'))
 
     try:
-        analysis_results_path = session.get('analysis_results_path')
-        analysis_parameters = session.get('analysis_parameters')
+        # ダッシュボード用データは分析IDごとにメモ化されたものを使う
+        _, analysis_parameters = load_analysis_from_cache()
+        dashboard_data = load_dashboard_data_from_session()
 
-        if not analysis_results_path or not os.path.exists(analysis_results_path) or not analysis_parameters:
-            app.logger.error("ダッシュボード表示エラー: セッションに分析結果パスまたはパラメータがありません。")
+        if dashboard_data is None or not analysis_parameters:
+            app.logger.error("ダッシュボード表示エラー: キャッシュに分析結果または分析パラメータがありません。")
             return render_template('error.html', message='分析データがセッションに見つかりません。再分析してください。')
         
-        with open(analysis_results_path, 'rb') as f:
-            analysis_results = pickle.load(f)
-            
-        visualizer = DashboardVisualizer()
-        dashboard_data = visualizer.generate_dashboard_data(analysis_results)
-        
         return render_template('dashboard.html', 
                              data=dashboard_data,
                              parameters=analysis_parameters)
@@ -232,31 +433,26 @@ def generate_report():
         return render_template('error.html', message='レポートを生成するには、まず分析を実行してください。')
 
     try:
-        analysis_results_path = session.get('analysis_results_path')
-        analysis_parameters = session.get('analysis_parameters')
+        analysis_results, analysis_parameters = load_analysis_from_cache()
 
-        if not analysis_results_path or not os.path.exists(analysis_results_path) or not analysis_parameters:
-            app.logger.error("レポート生成エラー: セッションに分析結果パスまたはパラメータがありません。")
+        if analysis_results is None or not analysis_parameters:
+            app.logger.error("レポート生成エラー: キャッシュに分析結果または分析パラメータがありません。")
             return render_template('error.html', message='分析データがセッションに見つかりません。再分析してください。')
-        
-        with open(analysis_results_path, 'rb') as f:
-            analysis_results = pickle.load(f)
             
         generator = ReportGenerator()
         app.logger.info(f"レポート生成開始: parameters={json.dumps(analysis_parameters, indent=2, ensure_ascii=False)}")
-        report_path = generator.generate_text_report(
+        # レポートはディスクを経由せずメモリ上のバッファに書き込んで返す
+        report_buffer = io.BytesIO()
+        generator.generate_text_report(
             analysis_results,
-            analysis_parameters
+            analysis_parameters,
+            output=report_buffer
         )
-        app.logger.info(f"レポートファイルパス: {report_path}")
-        
-        if not os.path.exists(report_path):
-            app.logger.error(f"生成されたレポートファイルが見つかりません: {report_path}")
-            return render_template('error.html', message=f'生成されたレポートファイルが見つかりません: {report_path}')
+        report_buffer.seek(0)
             
-        return send_file(report_path, 
+        return send_file(report_buffer,
+                        mimetype='text/plain',
                         as_attachment=True,
-                        # download_nameは送信時に設定されるため、固定名で良い場合もある
                         download_name=f'リピート分析レポート_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt')
     
     except Exception as e:
@@ -281,5 +477,7 @@ def handle_exception(e):
     return render_template('error.html', message='処理中に予期せぬエラーが発生しました。'), 500
 
 if __name__ == '__main__':
-    # debug=True は開発時のみ。本番環境ではFalseに。
-    app.run(debug=True, host='0.0.0.0', port=5001) 
\ No newline at end of file
+    # 開発用サーバー。debug=True は開発時のみ。本番環境では gunicorn -c gunicorn.conf.py (wsgi.py) で起動する。
+    # リローダーはモジュールを二重に読み込み、プロセス内キャッシュやバックグラウンド処理のスレッドも
+    # 二重に作られるため無効化し、リクエストはスレッドで並行処理する。
+    app.run(debug=True, use_reloader=False, threaded=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,31 @@
+"""
+gunicorn設定 - 本番環境用WSGIサーバーの起動設定
+
+起動: gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+
+# CSVパースやpandasの集計はCPUバウンドなため、CPUコア数分のワーカープロセスで並列に処理する。
+# ただし処理済みデータ・分析結果のキャッシュがプロセス内メモリ (SimpleCache) の場合は
+# ワーカー間で共有できないため、1プロセスに固定する (CACHE_TYPE=RedisCache などを指定すると複数化)。
+_process_local_caches = {'SimpleCache', 'NullCache'}
+if os.environ.get('CACHE_TYPE', 'SimpleCache') in _process_local_caches:
+    _default_workers = 1
+else:
+    _default_workers = multiprocessing.cpu_count()
+workers = int(os.environ.get('GUNICORN_WORKERS', _default_workers))
+
+# アップロード待ちなどのI/O中も他のリクエストを受け付けられるよう、各ワーカーでスレッドを併用する
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# 大きなCSVの読み込み・分析に時間がかかるため、デフォルト (30秒) より長めに取る
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+
+accesslog = '-'
+errorlog = '-'
@@ -4,53 +4,93 @@
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pa_compute
+import pyarrow.csv as pa_csv
+import codecs
+import csv
+import io
 import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import chardet
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional, Union
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# CSVの読み込み元: ファイルパス、または (ファイル名, ファイル内容のバイト列)
+CsvSource = Union[str, Tuple[str, bytes]]
+
+# エンコーディング検出に使う先頭部分のバイト数 (ファイル全体を走査しない)
+ENCODING_DETECTION_BYTES = 64 * 1024
+
+# 氏名・スタイリスト名から除去する空白 (全角スペースを含む) と、電話番号から除去する数字以外の文字
+WHITESPACE_PATTERN = re.compile(r'[\s　]+')
+NON_DIGIT_PATTERN = re.compile(r'[^\d]')
+
+# 半角カタカナ (句読点・長音記号・濁点・半濁点を含む U+FF61〜U+FF9F) を全角に変換する表。
+# 濁点・半濁点は結合文字になるため、変換後にNFCで直前の文字と合成する (ｶﾞ → ガ)
+HALFWIDTH_KATAKANA_TABLE = str.maketrans(
+    {chr(code): unicodedata.normalize('NFKC', chr(code)) for code in range(0xFF61, 0xFFA0)}
+)
+
 class DataProcessor:
     """データ処理クラス"""
     
-    def __init__(self, default_encoding: Optional[str] = None):
+    def __init__(self, default_encoding: Optional[str] = None, block_size: int = 8 << 20,
+                 max_workers: int = 8):
         self.customer_id_columns = ['電話番号', 'フリガナ', 'お名前', '氏名(カナ)', '氏名(漢字)', 'お客様番号']
         self.required_columns = ['ステータス', '来店日', 'このサロンに行くのは初めてですか？']
+        # クレンジング・顧客同定には使わないが、分析で参照するためそのまま残すカラム
+        self.passthrough_columns = ['スタイリスト名', '予約時HotPepperBeautyクーポン', '予約時合計金額',
+                                    '性別', '予約時メニュー', '年代']
         self.default_encoding = default_encoding
-        
-    def load_and_combine_csv_files(self, file_paths: List[str]) -> pd.DataFrame:
+        # pyarrowのCSVリーダーが1スレッドで処理するブロックのバイト数
+        self.block_size = block_size
+        # 複数ファイルを並行して読み込む際の最大スレッド数
+        self.max_workers = max_workers
+        # 来店日は _clean_visit_date で書式を判定してパースするため文字列のまま読み込む。
+        # クレンジングで値を変更しない低カーディナリティのカラムは、パース時点で辞書エンコードしておく
+        # (pandasへの変換時に文字列オブジェクトを作らず、そのままカテゴリ型になる)
+        dictionary_type = pa.dictionary(pa.int32(), pa.string())
+        self.csv_column_types = {
+            '来店日': pa.string(),
+            'ステータス': dictionary_type,
+            '性別': dictionary_type,
+            '予約時HotPepperBeautyクーポン': dictionary_type,
+        }
+        # load_and_combine_csv_files 実行時に来店日のパースと同時に求める (最初の日付, 最後の日付)
+        self.date_range: Tuple[Optional[str], Optional[str]] = (None, None)
+        # 重複の多い文字列カラム。クレンジング後にカテゴリ型 (整数コード) へ変換する
+        # (辞書エンコードして読み込んだカラムも、ファイル間で型が揃わずに結合した場合に備えて含める)
+        self.categorical_columns = ['顧客ID', 'スタイリスト名', '予約時HotPepperBeautyクーポン', 'ステータス', '性別']
+        
+    def load_and_combine_csv_files(self, file_paths: List[CsvSource]) -> pd.DataFrame:
         """
         複数のCSVファイルを読み込み、結合・クレンジングして統一データフレームを返す
         
         Args:
-            file_paths: CSVファイルパスのリスト
+            file_paths: CSVファイルパス、または (ファイル名, ファイル内容のバイト列) のリスト。
+                        アップロードされたファイルはディスクに保存せずバイト列のまま渡せる
             
         Returns:
             結合・クレンジング済みのデータフレーム
         """
-        all_dataframes = []
-        
-        for file_path in file_paths:
-            try:
-                df = self._load_single_csv(file_path)
-                if df is not None and len(df) > 0:
-                    all_dataframes.append(df)
-                    logger.info(f"ファイル読み込み成功: {file_path} ({len(df)}件)")
-                else:
-                    logger.warning(f"ファイルが空またはエラー: {file_path}")
-            except Exception as e:
-                logger.error(f"ファイル読み込みエラー: {file_path} - {str(e)}")
-                continue
+        # CSVのパース中はGILが解放されるため、ファイル単位でスレッドに振り分ける (結果はファイル順を保持)
+        max_workers = max(1, min(self.max_workers, len(file_paths)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            loaded_tables = list(executor.map(self._load_file_for_combine, file_paths))
+        all_tables = [table for table in loaded_tables if table is not None]
         
-        if not all_dataframes:
+        if not all_tables:
             raise ValueError("読み込み可能なCSVファイルがありません")
         
         # データフレーム結合
-        combined_df = pd.concat(all_dataframes, ignore_index=True)
+        combined_df = self._combine_tables(all_tables)
         logger.info(f"全ファイル結合完了: {len(combined_df)}件")
         
         # データクレンジング
@@ -61,6 +101,11 @@ class DataProcessor:
         final_df = self._identify_customers(cleaned_df)
         logger.info(f"顧客同定完了: {len(final_df)}件")
 
+        # groupby・結合を整数コードで行えるようカテゴリ型に変換
+        final_df = self._encode_categorical_columns(final_df)
+        # 数値カラムを値が収まる最小の型に縮小
+        final_df = self._downcast_numeric_columns(final_df)
+
         # RepeatAnalyzerが必要とする可能性のある主要カラムの存在確認ログ
         expected_columns_for_analysis = [
             '来店日', '顧客ID', 'スタイリスト名', 
@@ -76,66 +121,320 @@ class DataProcessor:
         
         return final_df
     
-    def _load_single_csv(self, file_path: str) -> Optional[pd.DataFrame]:
+    def _load_file_for_combine(self, source: CsvSource) -> Optional[pa.Table]:
+        """
+        結合用に単一CSVファイルを読み込む（空ファイル・読み込みエラーは None）
+
+        Args:
+            source: CSVファイルパス、または (ファイル名, ファイル内容のバイト列)
+
+        Returns:
+            Arrowテーブル or None
+        """
+        file_path = source if isinstance(source, str) else source[0]
+        try:
+            table = self._load_single_csv(source)
+            if table is not None and table.num_rows > 0:
+                logger.info(f"ファイル読み込み成功: {file_path} ({table.num_rows}件)")
+                return table
+            logger.warning(f"ファイルが空またはエラー: {file_path}")
+        except Exception as e:
+            logger.error(f"ファイル読み込みエラー: {file_path} - {str(e)}")
+        return None
+
+    def _combine_tables(self, tables: List[pa.Table]) -> pd.DataFrame:
+        """
+        ファイルごとのArrowテーブルを結合し、1回だけpandasに変換する
+
+        pa.concat_tables はチャンクを並べるだけでデータをコピーしない。
+        ファイル間でカラム構成が異なる場合は欠損で補い、型が異なる場合は共通の型に揃える。
+        共通の型がない場合 (数値と文字列など) は pandas.concat と同じくファイル単位で変換してから結合する。
+
+        Args:
+            tables: ファイルごとのArrowテーブル
+
+        Returns:
+            結合したデータフレーム
+        """
+        try:
+            combined_table = pa.concat_tables(tables, promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            logger.info(f"カラムの型がファイル間で一致しないため、pandasで結合します: {e}")
+            return pd.concat([table.to_pandas() for table in tables], ignore_index=True, copy=False)
+        # 来店日が空の行は _clean_visit_date でも除外されるため、pandasへの変換前にArrow上で取り除く。
+        # 行番号 (UNKNOWN_ の顧客IDに使われる) は結合後の位置のまま残す
+        row_positions = self._rows_with_visit_date(combined_table)
+        if row_positions is None:
+            return combined_table.to_pandas(self_destruct=True, split_blocks=True)
+        logger.info(f"来店日が空の行を除外: {combined_table.num_rows - len(row_positions)}件")
+        df = combined_table.take(row_positions).to_pandas(self_destruct=True, split_blocks=True)
+        df.index = pd.Index(row_positions.to_numpy(), dtype=np.int64)
+        return df
+
+    def _rows_with_visit_date(self, table: pa.Table) -> Optional[pa.Array]:
+        """
+        来店日が空でない行の位置を返す
+
+        Args:
+            table: 結合したArrowテーブル
+
+        Returns:
+            来店日が空でない行の位置 (来店日カラムがない、または空の行がない場合は None)
+        """
+        if '来店日' not in table.column_names or table['来店日'].null_count == 0:
+            return None
+        return pa_compute.indices_nonzero(pa_compute.is_valid(table['来店日']))
+
+    def _encode_categorical_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        顧客ID・スタイリスト名・クーポン名などをカテゴリ型に変換する
+
+        Arrowの辞書型で読み込んだカラム (ステータス・性別・クーポン名) はカテゴリがCSVでの出現順になるため、
+        名前順に並べ直す (groupby の結果の順序がアップロードしたファイルの行順に左右されないようにする)。
+
+        Args:
+            df: 顧客同定済みのデータフレーム
+
+        Returns:
+            カテゴリ型に変換したデータフレーム
+        """
+        for col in self.categorical_columns:
+            if col in df.columns:
+                categorical = df[col].astype('category')
+                if not categorical.cat.categories.is_monotonic_increasing:
+                    categorical = categorical.cat.reorder_categories(sorted(categorical.cat.categories))
+                df[col] = categorical
+        return df
+
+    def _downcast_numeric_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        整数・浮動小数点カラムを値を損なわない範囲で小さい型に変換する
+
+        整数は符号付きのまま (int8/16/32) 、浮動小数点は float32 で値が変わらない場合のみ縮小する。
+
+        Args:
+            df: データフレーム
+
+        Returns:
+            数値カラムを縮小したデータフレーム
+        """
+        for col in df.select_dtypes(include='integer').columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        for col in df.select_dtypes(include='floating').columns:
+            # pd.to_numeric(downcast='float') は誤差のある変換も許容するため、往復して一致する場合のみ縮小する
+            downcast = df[col].astype('float32')
+            if downcast.astype(df[col].dtype).equals(df[col]):
+                df[col] = downcast
+        return df
+
+    def _load_single_csv(self, source: CsvSource) -> Optional[pa.Table]:
         """
         単一CSVファイルを読み込む（エンコーディング自動判定）
+
+        デコードに失敗した場合のみ次のエンコーディングを試す。CSVの構造の問題などデコード以外のエラーは
+        別のエンコーディングでも解決しないため、そのまま送出する。
         
         Args:
-            file_path: CSVファイルパス
+            source: CSVファイルパス、または (ファイル名, ファイル内容のバイト列)
             
         Returns:
-            データフレーム
+            Arrowテーブル (全エンコーディングでデコードできない場合は None)
         """
-        # エンコーディング検出
-        with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            encoding_result = chardet.detect(raw_data)
-            detected_encoding = encoding_result['encoding']
-        
+        if isinstance(source, str):
+            file_path = source
+            with open(file_path, 'rb') as f:
+                raw_data = f.read()
+        else:
+            file_path, raw_data = source
+
         # 複数エンコーディングでトライ
-        encodings_to_try = []
-        if self.default_encoding:
-            encodings_to_try.append(self.default_encoding)
-        
-        # 重複を避けるためにセットを使ってからリストに戻す
-        potential_encodings = [
-            'utf-8-sig',
-            detected_encoding,
-            'cp932',
-            'shift_jis',
-            'utf-8'
-        ]
-        for enc in potential_encodings:
-            if enc and enc not in encodings_to_try:
-                encodings_to_try.append(enc)
-        
-        for encoding in encodings_to_try:
-            if encoding is None:
-                continue
+        for encoding in self._candidate_encodings(raw_data):
             try:
-                df = pd.read_csv(file_path, encoding=encoding)
+                table = self._read_csv_with_arrow(raw_data, encoding)
                 logger.info(f"エンコーディング成功: {file_path} ({encoding})")
-                return df
-            except (UnicodeDecodeError, UnicodeError):
+                return table
+            except (UnicodeError, LookupError) as e:
+                # UnicodeDecodeError を含むデコード失敗と、Pythonが対応していないエンコーディング名
+                logger.info(f"エンコーディング不一致 ({encoding}): {file_path} - {str(e)}")
                 continue
-            except Exception as e:
-                logger.warning(f"CSV読み込みエラー ({encoding}): {str(e)}")
+            except pa.ArrowInvalid as e:
+                # 文字列型を指定したカラムの値がUTF-8としてデコードできない場合もデコード失敗として扱う
+                if 'invalid UTF8' not in str(e):
+                    raise
+                logger.info(f"エンコーディング不一致 ({encoding}): {file_path} - {str(e)}")
                 continue
         
         logger.error(f"全エンコーディングで読み込み失敗: {file_path}")
         return None
-    
+
+    def _candidate_encodings(self, raw_data: bytes) -> Iterator[str]:
+        """
+        CSVの読み込みを試すエンコーディングを優先順に返す
+
+        先頭部分がUTF-8としてデコードできるファイルは、エンコーディング検出を行わずにUTF-8 (BOM付き) から試す。
+        それ以外のファイルはUTF-8での読み込み (必ず失敗する) を省き、chardetの検出結果の確度が高ければ
+        それを最初に、低ければShift_JIS系を優先して試す。
+
+        Args:
+            raw_data: CSVファイルの内容
+
+        Yields:
+            エンコーディング名 (重複なし)
+        """
+        tried = set()
+        if self.default_encoding:
+            tried.add(self.default_encoding)
+            yield self.default_encoding
+
+        # エンコーディング検出 (先頭部分のみで判定する)
+        sample = raw_data[:ENCODING_DETECTION_BYTES]
+        if self._is_utf8_sample(sample):
+            if 'utf-8-sig' not in tried:
+                tried.add('utf-8-sig')
+                yield 'utf-8-sig'
+            detected_encoding = chardet.detect(sample)['encoding']
+            potential_encodings = [detected_encoding, 'cp932', 'shift_jis', 'utf-8']
+        else:
+            detection = chardet.detect(sample)
+            detected_encoding = detection['encoding']
+            if (detection['confidence'] or 0) >= 0.9:
+                potential_encodings = [detected_encoding, 'cp932', 'shift_jis']
+            else:
+                potential_encodings = ['cp932', 'shift_jis', detected_encoding]
+
+        for enc in potential_encodings:
+            if enc and enc not in tried:
+                tried.add(enc)
+                yield enc
+
+    def _is_utf8_sample(self, sample: bytes) -> bool:
+        """ファイル先頭部分がUTF-8 (BOM付きを含む) としてデコードできるか (末尾で切れた文字は許容する)"""
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        except UnicodeDecodeError:
+            return False
+        return True
+
+    def _read_csv_with_arrow(self, raw_data: bytes, encoding: str) -> pa.Table:
+        """
+        pyarrowのマルチスレッドCSVリーダーでCSVの内容を読み込む
+
+        エンコーディング検出で読み込み済みのバイト列をそのまま渡し、ファイルの再読み込みを避ける。
+        処理・分析で使わないカラム (備考など) はパース・型変換の対象から外す。
+        引用符内の改行 (メニュー・備考欄など) を許可する。列数が足りない行などpyarrowでパースできない
+        ファイルは、pandas.read_csv と同じく不足分を欠損値として読み込めるよう pandas で読み直す。
+
+        Args:
+            raw_data: CSVファイルの内容
+            encoding: 使用するエンコーディング
+
+        Returns:
+            Arrowテーブル (pandasへの変換はファイル結合後にまとめて行う)
+        """
+        read_options = pa_csv.ReadOptions(encoding=encoding, block_size=self.block_size)
+        # ブロックの境界をまたぐ引用符内の改行も値の一部として扱う
+        parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+        # 空文字は pandas.read_csv と同様に欠損値として扱う
+        needed_columns = self._needed_columns(raw_data, encoding)
+        column_types = self._column_types_for(needed_columns)
+        convert_options = pa_csv.ConvertOptions(column_types=column_types,
+                                                include_columns=needed_columns,
+                                                strings_can_be_null=True)
+        try:
+            table = pa_csv.read_csv(pa.BufferReader(raw_data), read_options=read_options,
+                                    parse_options=parse_options, convert_options=convert_options)
+        except pa.ArrowInvalid as e:
+            if not str(e).startswith('CSV parse error'):
+                raise
+            logger.warning(f"pyarrowでパースできないため、pandasで読み込みます: {e}")
+            return self._read_csv_with_pandas(raw_data, encoding, needed_columns, column_types)
+
+        # UTF-8としてデコードできない列はbinary型になるため、デコード失敗として扱う
+        binary_columns = [field.name for field in table.schema if pa.types.is_binary(field.type)]
+        if binary_columns:
+            raise UnicodeError(f"{encoding} でデコードできないカラムがあります: {binary_columns}")
+
+        return table
+
+    def _read_csv_with_pandas(self, raw_data: bytes, encoding: str, needed_columns: List[str],
+                              column_types: Dict[str, pa.DataType]) -> pa.Table:
+        """
+        pandas.read_csv でCSVの内容を読み込み、pyarrowで読み込んだ場合と同じ型のArrowテーブルにする
+
+        列数が足りない行は不足分を欠損値として読み込む (pyarrowのCSVリーダーではファイル全体がエラーになる)。
+
+        Args:
+            raw_data: CSVファイルの内容
+            encoding: 使用するエンコーディング
+            needed_columns: 読み込むカラム名のリスト (空の場合は全カラム)
+            column_types: カラム名 -> Arrowの型
+
+        Returns:
+            Arrowテーブル
+        """
+        df = pd.read_csv(io.BytesIO(raw_data), encoding=encoding, usecols=needed_columns or None,
+                         dtype={col: str for col in column_types})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for col, column_type in column_types.items():
+            if col in table.column_names:
+                table = table.set_column(table.column_names.index(col), col, table[col].cast(column_type))
+        return table
+
+    def _needed_columns(self, raw_data: bytes, encoding: str) -> List[str]:
+        """
+        CSVのヘッダー行から、処理・分析で使うカラム名をファイル内の順序で取り出す
+
+        Args:
+            raw_data: CSVファイルの内容
+            encoding: 使用するエンコーディング
+
+        Returns:
+            読み込むカラム名のリスト (空の場合は全カラムを読み込む)
+        """
+        header_line = raw_data.split(b'\n', 1)[0].decode(encoding).lstrip('\ufeff').rstrip('\r')
+        header = next(csv.reader(io.StringIO(header_line)), [])
+
+        known_columns = set(self.customer_id_columns + self.required_columns + self.passthrough_columns)
+        needed_columns = []
+        for col in header:
+            # 電話番号は「電話番号2」などの派生カラムも統一電話番号の候補になる
+            if (col in known_columns or '電話番号' in col) and col not in needed_columns:
+                needed_columns.append(col)
+        return needed_columns
+
+    def _column_types_for(self, columns: List[str]) -> Dict[str, pa.DataType]:
+        """
+        読み込むカラムに指定する型を返す (指定のないカラムはpyarrowが型を推定する)
+
+        電話番号・氏名は数字だけの値でも文字列として読み込み、型推定のための走査と
+        整数への変換 (先頭の0が落ちる) を避ける。
+
+        Args:
+            columns: 読み込むカラム名のリスト
+
+        Returns:
+            カラム名 -> Arrowの型
+        """
+        column_types = dict(self.csv_column_types)
+        name_columns = {'フリガナ', 'お名前', '氏名(カナ)', '氏名(漢字)'}
+        for col in columns:
+            if '電話番号' in col or col in name_columns:
+                column_types[col] = pa.string()
+        return column_types
+
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         データクレンジング処理
+
+        各クレンジング処理は引数のデータフレームを直接更新する (カラム単位のコピーを避けるため)。
+        load_and_combine_csv_files で結合した直後のデータフレームを渡す前提。
         
         Args:
-            df: 元データフレーム
+            df: 元データフレーム (更新される)
             
         Returns:
             クレンジング済みデータフレーム
         """
-        df = df.copy()
         original_count = len(df)
         
         # 必須カラムの存在確認
@@ -169,41 +468,42 @@ class DataProcessor:
         # スタイリスト名の正規化（スペース除去）
         if 'スタイリスト名' in df.columns:
             logger.info("スタイリスト名の正規化（スペース除去）を実行します。")
-            df['スタイリスト名'] = df['スタイリスト名'].apply(
-                lambda x: re.sub(r'[\s　]+', '', str(x)) if pd.notna(x) else x
-            )
+            df['スタイリスト名'] = self._remove_whitespace_series(df['スタイリスト名'])
         
         return df
     
+    def _remove_whitespace_series(self, values: pd.Series) -> pd.Series:
+        """
+        列の値から全角/半角の空白を列単位で一括除去する
+
+        Args:
+            values: 文字列の列
+
+        Returns:
+            空白を除去した列 (欠損値はそのまま)
+        """
+        present = values.notna().to_numpy()
+        cleaned = values.to_numpy(dtype=object, copy=True)
+        cleaned[present] = values[present].astype(str).str.replace(WHITESPACE_PATTERN, '', regex=True).to_numpy(dtype=object)
+        return pd.Series(cleaned, index=values.index, dtype=object)
+
     def _clean_visit_date(self, df: pd.DataFrame) -> pd.DataFrame:
-        """来店日の処理"""
-        df = df.copy()
-        
+        """来店日の処理 (引数のデータフレームを直接更新する)"""
         if '来店日' not in df.columns:
             logger.error("来店日カラムが存在しません")
             return df
         
-        # 来店日をdatetimeに変換
-        def parse_date(date_str):
-            if pd.isna(date_str):
-                return None
-            try:
-                # YYYYMMDDフォーマットを想定
-                date_str = str(date_str).strip()
-                if len(date_str) == 8 and date_str.isdigit():
-                    return datetime.strptime(date_str, '%Y%m%d')
-                else:
-                    # その他の日付フォーマットも試行
-                    return pd.to_datetime(date_str)
-            except:
-                return None
-        
-        df['来店日_parsed'] = df['来店日'].apply(parse_date)
+        # 来店日をdatetimeに変換 (列単位で一括パース)
+        df['来店日_parsed'] = self._parse_visit_dates(df['来店日'])
         
         # 有効な来店日のレコードのみ残す
         valid_dates = df['来店日_parsed'].notna()
-        df = df[valid_dates].copy()
+        if not valid_dates.all():
+            df = df[valid_dates].copy()
         logger.info(f"有効な来店日でフィルタ: {len(df)}件")
+
+        # パース直後の列から日付範囲を求めておき、読み込み後の再走査 (get_date_range) を不要にする
+        self.date_range = self._compute_date_range(df['来店日_parsed'])
         
         # '来店日_parsed' カラムが存在する場合、元の '来店日' カラムを削除し、'来店日_parsed' を '来店日' にリネーム
         if '来店日_parsed' in df.columns:
@@ -213,172 +513,277 @@ class DataProcessor:
             
         return df
     
+    def _parse_visit_dates(self, dates: pd.Series) -> pd.Series:
+        """
+        来店日の列をdatetime型に一括変換する
+
+        8桁の数字 (YYYYMMDD) はその書式で、それ以外は値ごとに書式を推定してパースする。
+        パースできない値は NaT になる。
+
+        Args:
+            dates: 来店日の列
+
+        Returns:
+            datetime型の来店日
+        """
+        present = dates.notna().to_numpy()
+        date_strs = dates[present].astype(str).str.strip()
+        # YYYYMMDDフォーマットを想定
+        is_compact = ((date_strs.str.len() == 8) & date_strs.str.isdigit()).to_numpy()
+
+        parsed_values = np.full(len(date_strs), np.datetime64('NaT'), dtype='datetime64[ns]')
+        if is_compact.any():
+            parsed_values[is_compact] = pd.to_datetime(
+                date_strs[is_compact], format='%Y%m%d', errors='coerce').to_numpy()
+        if (~is_compact).any():
+            # その他の日付フォーマットも試行 (書式が混在していても値ごとに判定)
+            other_strs = date_strs[~is_compact]
+            try:
+                other_parsed = pd.to_datetime(other_strs, format='mixed', errors='coerce')
+            except ValueError:
+                # タイムゾーン付きの値が混在する場合はUTCに揃えてからタイムゾーン情報を外す
+                other_parsed = pd.to_datetime(other_strs, format='mixed', errors='coerce', utc=True).dt.tz_localize(None)
+            parsed_values[~is_compact] = other_parsed.to_numpy()
+
+        parsed = np.full(len(dates), np.datetime64('NaT'), dtype='datetime64[ns]')
+        parsed[present] = parsed_values
+        return pd.Series(parsed, index=dates.index)
+
     def _clean_customer_info(self, df: pd.DataFrame) -> pd.DataFrame:
-        """顧客情報のクレンジング"""
-        df = df.copy()
-        
+        """顧客情報のクレンジング (引数のデータフレームを直接更新する)"""
         # お客様番号の処理（指数表記の修正）
         if 'お客様番号' in df.columns:
-            def clean_customer_number(val):
-                if pd.isna(val):
-                    return None
-                try:
-                    # 指数表記を文字列に変換
-                    if isinstance(val, float):
-                        return f"{val:.0f}"
-                    return str(val).strip()
-                except:
-                    return str(val)
-            
-            df['お客様番号_cleaned'] = df['お客様番号'].apply(clean_customer_number)
+            df['お客様番号_cleaned'] = self._clean_customer_number_series(df['お客様番号'])
         
         return df
+
+    def _clean_customer_number_series(self, numbers: pd.Series) -> pd.Series:
+        """
+        お客様番号を列単位で文字列に揃える
+
+        浮動小数点で読み込まれた番号 (指数表記など) は小数点以下なしの整数表記にし、
+        それ以外の値は文字列化して前後の空白を除去する。
+
+        Args:
+            numbers: お客様番号の列
+
+        Returns:
+            文字列のお客様番号 (欠損は None)
+        """
+        present = numbers.notna().to_numpy()
+        present_numbers = numbers[present]
+
+        if pd.api.types.is_float_dtype(present_numbers):
+            cleaned_values = self._format_float_numbers(present_numbers.to_numpy(dtype=np.float64))
+        else:
+            cleaned_values = present_numbers.astype(str).str.strip().to_numpy(dtype=object)
+            # ファイルごとに型が異なり数値と文字列が混在する列では、浮動小数点の要素のみ整数表記にする
+            if pd.api.types.infer_dtype(present_numbers, skipna=True) not in ('string', 'integer', 'empty'):
+                is_float = present_numbers.map(lambda value: isinstance(value, float)).to_numpy(dtype=bool)
+                cleaned_values[is_float] = self._format_float_numbers(
+                    present_numbers[is_float].to_numpy(dtype=np.float64)
+                )
+
+        cleaned = np.full(len(numbers), None, dtype=object)
+        cleaned[present] = cleaned_values
+        return pd.Series(cleaned, index=numbers.index, dtype=object)
+
+    def _format_float_numbers(self, values: np.ndarray) -> np.ndarray:
+        """
+        浮動小数点の配列を f"{value:.0f}" と同じ整数表記の文字列にする
+
+        Args:
+            values: float64の配列
+
+        Returns:
+            文字列のオブジェクト配列
+        """
+        # np.round は f"{value:.0f}" と同じく偶数丸め。int64に収まる有限値は整数に変換してまとめて文字列化する
+        rounded = np.round(values)
+        as_integer = np.isfinite(rounded) & (np.abs(rounded) < 2.0 ** 63) & ~((rounded == 0) & np.signbit(values))
+
+        formatted = np.empty(len(values), dtype=object)
+        formatted[as_integer] = rounded[as_integer].astype(np.int64).astype(str)
+        # inf・巨大な値・負のゼロ ("-0") はPythonの書式化に任せる
+        formatted[~as_integer] = [f"{value:.0f}" for value in values[~as_integer]]
+        return formatted
     
     def _clean_phone_numbers(self, df: pd.DataFrame) -> pd.DataFrame:
-        """電話番号の統一処理"""
-        df = df.copy()
-        
+        """電話番号の統一処理 (引数のデータフレームを直接更新する)"""
         phone_columns = [col for col in df.columns if '電話番号' in col]
         
-        def normalize_phone(phone):
-            if pd.isna(phone):
-                return None
-            # 非数値文字を除去
-            phone_clean = re.sub(r'[^\d]', '', str(phone))
-            return phone_clean if phone_clean else None
-        
-        for col in phone_columns:
-            df[f'{col}_normalized'] = df[col].apply(normalize_phone)
-        
-        # 複数の電話番号カラムがある場合の整合性チェック
+        # 正規化した電話番号は統一電話番号の作成にのみ使うため、カラムごとの作業列としては残さない
+        # (電話番号カラムが1つの場合は、正規化結果をそのまま統一電話番号にする)
         if len(phone_columns) > 1:
-            def check_phone_consistency(row):
-                phones = [row[f'{col}_normalized'] for col in phone_columns]
-                phones = [p for p in phones if p is not None]
-                return phones[0] if phones else None
-            
-            df['統一電話番号'] = df.apply(check_phone_consistency, axis=1)
+            # 複数の電話番号カラムがある場合の整合性チェック (行ごとに最初の有効な電話番号を採用)
+            unified = self._normalize_phone_series(df[phone_columns[-1]]).to_numpy()
+            for col in reversed(phone_columns[:-1]):
+                normalized = self._normalize_phone_series(df[col])
+                unified = np.where(normalized.notna().to_numpy(), normalized.to_numpy(), unified)
+            df['統一電話番号'] = pd.Series(unified, index=df.index, dtype=object)
         elif phone_columns:
-            df['統一電話番号'] = df[f'{phone_columns[0]}_normalized']
+            df['統一電話番号'] = self._normalize_phone_series(df[phone_columns[0]])
+        else:
+            # 電話番号カラムがない場合も、顧客同定で参照するカラムは揃えておく
+            logger.warning("電話番号カラムが存在しないため、電話番号による顧客同定は行いません。")
+            df['統一電話番号'] = pd.Series(None, index=df.index, dtype=object)
         
         return df
+
+    def _normalize_phone_series(self, phones: pd.Series) -> pd.Series:
+        """
+        電話番号列から数字以外の文字を列単位で一括除去する
+
+        Args:
+            phones: 電話番号の列
+
+        Returns:
+            数字のみの電話番号 (欠損・数字を含まない値は None)
+        """
+        present = phones.notna().to_numpy()
+        digits = phones[present].astype(str).str.replace(NON_DIGIT_PATTERN, '', regex=True).to_numpy(dtype=object)
+        digits[digits == ''] = None
+
+        normalized = np.full(len(phones), None, dtype=object)
+        normalized[present] = digits
+        return pd.Series(normalized, index=phones.index, dtype=object)
+    
+    def _normalize_name_series(self, names: pd.Series) -> pd.Series:
+        """
+        氏名列から空白を除去し、半角カタカナを全角に統一する (列単位で一括処理)
+
+        Args:
+            names: 氏名の列
+
+        Returns:
+            正規化した氏名 (欠損・空白のみの値は None)
+        """
+        present = names.notna().to_numpy()
+        normalized_values = (
+            names[present].astype(str)
+            .str.replace(WHITESPACE_PATTERN, '', regex=True)  # 全角/半角スペース除去
+            .str.translate(HALFWIDTH_KATAKANA_TABLE)
+            .str.normalize('NFC')
+            .to_numpy(dtype=object)
+        )
+        normalized_values[normalized_values == ''] = None
+
+        normalized = np.full(len(names), None, dtype=object)
+        normalized[present] = normalized_values
+        return pd.Series(normalized, index=names.index, dtype=object)
     
     def _clean_names(self, df: pd.DataFrame) -> pd.DataFrame:
-        """氏名の正規化処理"""
-        df = df.copy()
-        
+        """氏名の正規化処理 (引数のデータフレームを直接更新する)"""
         name_columns = ['フリガナ', 'お名前', '氏名(カナ)', '氏名(漢字)']
         
-        def normalize_name(name):
-            if pd.isna(name):
-                return None
-            # 全角/半角スペース除去、カタカナ統一
-            name_clean = str(name).strip()
-            name_clean = re.sub(r'[\s　]+', '', name_clean)  # スペース除去
-            # カタカナを全角に統一（簡易版）
-            name_clean = name_clean.replace('ｱ', 'ア').replace('ｶ', 'カ')  # など
-            return name_clean if name_clean else None
-        
         for col in name_columns:
             if col in df.columns:
-                df[f'{col}_normalized'] = df[col].apply(normalize_name)
+                df[f'{col}_normalized'] = self._normalize_name_series(df[col])
         
         # 統一氏名キーの生成
-        def create_name_key(row):
-            # 氏名情報を優先順位で結合
-            # *_normalized カラムが存在すればそれを使用し、なければ元のカラムを試す
-            kana_col_candidates = ['フリガナ_normalized', '氏名(カナ)_normalized', 'フリガナ', '氏名(カナ)']
-            kanji_col_candidates = ['お名前_normalized', '氏名(漢字)_normalized', 'お名前', '氏名(漢字)']
-            
-            kana = next((row.get(col) for col in kana_col_candidates if row.get(col) and pd.notna(row.get(col))), None)
-            kanji = next((row.get(col) for col in kanji_col_candidates if row.get(col) and pd.notna(row.get(col))), None)
-            
-            if kana and kanji:
-                return f"{str(kana).strip()}#{str(kanji).strip()}" # strip() を追加して前後の空白を除去
-            elif kana:
-                return str(kana).strip()
-            elif kanji:
-                return str(kanji).strip()
-            else:
-                return None 
+        # 氏名情報を優先順位で結合
+        # *_normalized カラムが存在すればそれを使用し、なければ元のカラムを試す
+        kana = self._first_present_value(df, ['フリガナ_normalized', '氏名(カナ)_normalized', 'フリガナ', '氏名(カナ)'])
+        kanji = self._first_present_value(df, ['お名前_normalized', '氏名(漢字)_normalized', 'お名前', '氏名(漢字)'])
+        has_kana = kana.notna().to_numpy()
+        has_kanji = kanji.notna().to_numpy()
+        # strip() で前後の空白を除去
+        kana_str = kana.astype(str).str.strip().to_numpy()
+        kanji_str = kanji.astype(str).str.strip().to_numpy()
 
-        df['統一氏名キー'] = df.apply(create_name_key, axis=1)
+        name_key = np.where(has_kana & has_kanji, kana_str + '#' + kanji_str,
+                   np.where(has_kana, kana_str,
+                   np.where(has_kanji, kanji_str, None)))
+        df['統一氏名キー'] = pd.Series(name_key, index=df.index, dtype=object)
         
         # ここでは正規化とキー生成のみ。顧客同定は _identify_customers で行う。
         return df
     
+    def _first_present_value(self, df: pd.DataFrame, candidates: List[str]) -> pd.Series:
+        """
+        候補カラムを優先順に見て、行ごとに最初の有効な値 (欠損・空文字でない値) を取り出す
+
+        Args:
+            df: データフレーム
+            candidates: 優先順の候補カラム名 (存在しないカラムは無視)
+
+        Returns:
+            行ごとの最初の有効な値 (該当なしは None)
+        """
+        result = np.full(len(df), None, dtype=object)
+        for col in reversed([col for col in candidates if col in df.columns]):
+            values = df[col]
+            is_present = (values.notna() & values.astype(bool)).to_numpy()
+            result = np.where(is_present, values.to_numpy(dtype=object), result)
+        return pd.Series(result, index=df.index, dtype=object)
+
     def _clean_boolean_flags(self, df: pd.DataFrame) -> pd.DataFrame:
-        """特定のフラグ列をブール型に変換する"""
-        df = df.copy()
+        """特定のフラグ列をブール型に変換する (引数のデータフレームを直接更新する)"""
         column_name = 'このサロンに行くのは初めてですか？'
         if column_name not in df.columns:
             logger.warning(f"カラム '{column_name}' が存在しないため、ブール変換をスキップします。")
             return df
 
+        df[column_name] = self._parse_first_visit_flags(df[column_name])
+        # Nullable Boolean (boolean) 型。RepeatAnalyzer側では == True と比較しているので、
+        # 欠損 (不明) や False は条件に合致しないため、実質的に False と同様に扱われる。
+
+        logger.info(f"カラム '{column_name}' のブール変換処理完了。")
+        return df
+    
+    def _parse_first_visit_flags(self, values: pd.Series) -> pd.Series:
+        """
+        「このサロンに行くのは初めてですか？」の値をブール値 (Nullable Boolean) に変換する
+
+        Args:
+            values: フラグカラムの値
+
+        Returns:
+            boolean型の列 (True/Falseのどちらにも該当しない値・欠損は pd.NA)
+        """
         # マッピング辞書: 文字列 -> ブール値
         # 小文字に変換して比較することで、大文字・小文字の揺れに対応
         true_values = ['true', 'yes', 'はい', 'はい、初めてです', '1']
         false_values = ['false', 'no', 'いいえ', '0']
 
-        def map_to_bool(value):
-            if pd.isna(value):
-                return None # または False をデフォルトにするか検討
-            str_value = str(value).lower().strip()
-            if str_value in true_values:
-                return True
-            if str_value in false_values:
-                return False
-            # どちらにも該当しない場合は None (不明) または False とする
-            # RepeatAnalyzerのロジックでは True 以外はリピーターとして扱われるため、NoneでもFalseでも同様の挙動になることが多い
-            # ここでは None として、欠損として扱う
-            logger.debug(f"カラム '{column_name}' の値 '{value}' はTrue/Falseに変換できませんでした。Noneとして扱います。")
-            return None 
-
-        df[column_name] = df[column_name].apply(map_to_bool)
-        # dtypeを明示的にboolにしたいが、Noneが含まれるとobjectになるため、ここでは変換しない。
-        # Pandas >= 1.0 であれば df[column_name] = df[column_name].astype("boolean") でNullable Booleanが使える。
-        # 現在のPandasのバージョンと挙動に依存する。Noneを許容するならobjectのままで良い。
-        # RepeatAnalyzer側では if new_customers['このサロンに行くのは初めてですか？'] == True: と比較しているので、
-        # None や False は条件に合致しないため、実質的に False と同様に扱われる。
+        bool_map = {value: True for value in true_values}
+        bool_map.update({value: False for value in false_values})
+
+        # 文字列化・小文字化したうえで辞書引きし、どちらにも該当しない値は欠損 (不明) とする
+        present = values.notna()
+        mapped = values[present].astype(str).str.lower().str.strip().map(bool_map)
+        unmapped_count = int(mapped.isna().sum())
+        if unmapped_count:
+            logger.debug(f"カラム '{values.name}' の {unmapped_count}件の値はTrue/Falseに変換できませんでした。欠損として扱います。")
+
+        flags = pd.Series(pd.NA, index=values.index, dtype='boolean', name=values.name)
+        flags[present] = mapped.astype('boolean')
+        return flags
 
-        logger.info(f"カラム '{column_name}' のブール変換処理完了。")
-        return df
-    
     def _identify_customers(self, df: pd.DataFrame) -> pd.DataFrame:
-        """顧客同定・統合処理"""
-        df = df.copy()
-        
+        """顧客同定・統合処理 (引数のデータフレームを直接更新する)"""
         # 顧客IDの生成
-        def generate_customer_id(row):
-            # 優先順位: 電話番号 > 統一氏名キー > お客様番号
-            phone = row.get('統一電話番号')
-            name = row.get('統一氏名キー')
-            customer_num = row.get('お客様番号_cleaned')
-            
-            if phone:
-                return f"PHONE_{phone}"
-            elif name:
-                return f"NAME_{name}"
-            elif customer_num:
-                return f"CUST_{customer_num}"
-            else:
-                # 一意なIDを生成（行番号ベース）
-                return f"UNKNOWN_{row.name}"
+        # 優先順位: 電話番号 > 統一氏名キー > お客様番号 (いずれもない場合は行番号ベースの一意なID)
+        conditions = []
+        choices = []
+        for column, prefix in [('統一電話番号', 'PHONE_'), ('統一氏名キー', 'NAME_'), ('お客様番号_cleaned', 'CUST_')]:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            conditions.append((values.notna() & (values != '')).to_numpy())
+            choices.append((prefix + values.astype(str)).to_numpy())
+        unknown_ids = ('UNKNOWN_' + df.index.astype(str)).to_numpy()
         
-        df['顧客ID'] = df.apply(generate_customer_id, axis=1)
+        df['顧客ID'] = np.select(conditions, choices, default=unknown_ids) if conditions else unknown_ids
         
         # 顧客IDごとの重複チェック・整合性確認
-        customer_groups = df.groupby('顧客ID')
-        
-        inconsistencies = []
-        for customer_id, group in customer_groups:
-            if len(group) > 1:
-                # 同一顧客IDでデータ整合性をチェック
-                phones = group['統一電話番号'].dropna().unique()
-                names = group['統一氏名キー'].dropna().unique()
-                
-                if len(phones) > 1 or len(names) > 1:
-                    inconsistencies.append(customer_id)
+        # 同一顧客IDに複数の電話番号・氏名キーが紐づいている顧客を、グループ単位のユニーク数で判定する
+        check_columns = [col for col in ['統一電話番号', '統一氏名キー'] if col in df.columns]
+        if check_columns:
+            unique_counts = df.groupby('顧客ID')[check_columns].nunique(dropna=True)
+            inconsistencies = unique_counts.index[(unique_counts > 1).any(axis=1)].tolist()
+        else:
+            inconsistencies = []
         
         if inconsistencies:
             logger.warning(f"データ整合性に問題のある顧客ID: {len(inconsistencies)}件")
@@ -422,55 +827,45 @@ class DataProcessor:
             # df['来店日'] = pd.to_datetime(df['来店日'], errors='coerce') # 強制変換する場合
             # df.dropna(subset=['来店日'], inplace=True) # 不正な日付を除去
 
-        first_visit_flag_col = 'このサロンに行くのは初めてですか？_bool'
-        if first_visit_flag_col not in df.columns:
-            # _bool カラムがない場合は元のカラム名で試すが、型や値のバリエーションに注意が必要
-            logger.warning(f"カラム '{first_visit_flag_col}' が見つかりません。元のカラム 'このサロンに行くのは初めてですか？' を使用しますが、ブール型への事前変換を推奨します。")
-            first_visit_flag_col = 'このサロンに行くのは初めてですか？'
-            if first_visit_flag_col not in df.columns: # 元のカラム名でも見つからない場合
-                 logger.error(f"get_new_customers: 新規判定フラグカラム ('{first_visit_flag_col}' または 'このサロンに行くのは初めてですか？_bool') がDataFrameに存在しません。")
-                 raise ValueError(f"新規判定フラグカラムが存在しません。")
-            # 元カラムの場合、Trueと評価されるべき値 (e.g., "はい", 1) も考慮が必要だが、
-            # ここでは _clean_boolean_flags で True/False になっていることを期待する
-            # df[first_visit_flag_col] = df[first_visit_flag_col].apply(lambda x: x == True or str(x).lower() == 'はい') # より堅牢な処理
+        # 新規判定フラグは _clean_boolean_flags でブール型に変換済み。
+        # 変換前のデータが渡された場合のみ、ここで同じ変換を行う
+        first_visit_flag_col = 'このサロンに行くのは初めてですか？'
+        first_visit_flags = df[first_visit_flag_col]
+        if not pd.api.types.is_bool_dtype(first_visit_flags):
+            first_visit_flags = self._parse_first_visit_flags(first_visit_flags)
 
 
         # 新規顧客判定ロジックの変更
-        df_copy = df.copy()
-
-        if '顧客ID' not in df_copy.columns or '来店日' not in df_copy.columns:
-            logger.error("get_new_customers: '顧客ID'または'来店日'カラムがdf_copyに不足しています。")
-            return pd.DataFrame()
+        # (作業列を追加せず条件の配列だけを作るため、入力データフレームはコピーしない)
 
         # 1. 各顧客の全期間における最初の来店日を計算
-        df_copy['全期間初回来店日'] = df_copy.groupby('顧客ID')['来店日'].transform('min')
+        first_visit_dates = df.groupby('顧客ID', observed=True)['来店日'].transform('min')
 
         # 2. 条件を定義
         # 条件A: この来店が全期間初回来店である
-        condition_A = (df_copy['来店日'] == df_copy['全期間初回来店日'])
+        condition_A = (df['来店日'] == first_visit_dates)
         # 条件B: この来店で「初めてフラグ」がTrueまたは空白（None/NaN）である
-        condition_B = (df_copy[first_visit_flag_col] == True) | (df_copy[first_visit_flag_col].isna())
+        condition_B = (first_visit_flags == True) | (first_visit_flags.isna())
         # 条件C: この来店が指定期間内である
-        condition_C_period = (df_copy['来店日'] >= start_dt) & (df_copy['来店日'] <= end_dt)
+        condition_C_period = (df['来店日'] >= start_dt) & (df['来店日'] <= end_dt)
 
         # 3. 全ての条件を満たす来店記録を抽出
-        true_new_customer_visits = df_copy[condition_A & condition_B & condition_C_period]
+        true_new_customer_visits = df[condition_A & condition_B & condition_C_period]
 
         if true_new_customer_visits.empty:
             logger.info(f"指定期間 ({start_date} - {end_date}) に「初めてフラグTrueまたは空白」かつ「全期間で初回来店」の顧客は見つかりませんでした。")
             final_new_customers = pd.DataFrame()
         else:
             # 条件を満たす来店は顧客ごとにユニークのはず (初回来店かつフラグTrueはその顧客にとって1回のみ)
-            # もし万が一、同一顧客で複数の日付がこの条件を満たす場合（データ不整合）、
-            # idxmin()で最初の日付のものを取ることで一意にする。
-            final_new_customers = true_new_customer_visits.loc[
-                true_new_customer_visits.groupby('顧客ID')['来店日'].idxmin()
-            ].copy() # .copy() をつけてSettingWithCopyWarningを回避
-
-        # 分析結果に不要な作業列を削除
-        if '全期間初回来店日' in final_new_customers.columns:
-            final_new_customers.drop(columns=['全期間初回来店日'], inplace=True)
-        
+            # もし万が一、同一顧客で複数の来店がこの条件を満たす場合（データ不整合）、
+            # 条件Aによりいずれも全期間初回来店日の来店なので、行順で最初のものを取って一意にする。
+            # 結果は groupby と同じく顧客ID順に並べる
+            final_new_customers = (
+                true_new_customer_visits
+                .drop_duplicates('顧客ID', keep='first')
+                .sort_values('顧客ID', kind='mergesort')
+            )
+
         if not final_new_customers.empty:
             logger.info(f"新規顧客抽出完了: {len(final_new_customers)}件。期間: {start_date} - {end_date}")
         # '来店日' カラムはこの時点でその顧客の「初回来店日」を指している
@@ -486,13 +881,30 @@ class DataProcessor:
         Returns:
             (最初の日付文字列, 最後の日付文字列) or (None, None)
         """
-        if '来店日' not in df.columns or df['来店日'].isnull().all() or not pd.api.types.is_datetime64_any_dtype(df['来店日']):
-            logger.warning("get_date_range: '来店日' カラムが存在しない、すべて欠損している、またはdatetime型ではありません。")
+        if '来店日' not in df.columns:
+            logger.warning("get_date_range: '来店日' カラムが存在しません。")
             return None, None
-        
+        return self._compute_date_range(df['来店日'])
+
+    def _compute_date_range(self, dates: pd.Series) -> Tuple[Optional[str], Optional[str]]:
+        """
+        来店日の列から最初と最後の日付を1パスで求める
+
+        Args:
+            dates: datetime型の来店日
+
+        Returns:
+            (最初の日付文字列, 最後の日付文字列) or (None, None)
+        """
+        if dates.isnull().all() or not pd.api.types.is_datetime64_any_dtype(dates):
+            logger.warning("日付範囲取得: '来店日' がすべて欠損している、またはdatetime型ではありません。")
+            return None, None
+
         try:
-            min_date = df['来店日'].min().strftime('%Y-%m-%d')
-            max_date = df['来店日'].max().strftime('%Y-%m-%d')
+            # pyarrowの min_max カーネルで最小値と最大値を同時に求める
+            min_max = pa_compute.min_max(pa.array(dates, from_pandas=True))
+            min_date = pd.Timestamp(min_max['min'].as_py()).strftime('%Y-%m-%d')
+            max_date = pd.Timestamp(min_max['max'].as_py()).strftime('%Y-%m-%d')
             return min_date, max_date
         except Exception as e:
             logger.error(f"日付範囲取得エラー: {e}")
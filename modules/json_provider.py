@@ -0,0 +1,52 @@
+"""
+JSONプロバイダーモジュール - orjsonによる高速なJSONエンコード
+"""
+
+import logging
+from typing import Any
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    orjsonでエンコード・デコードするFlask用JSONプロバイダー
+
+    jsonify やテンプレートの tojson フィルタ (ダッシュボードのグラフデータ埋め込み) で使われる。
+    NumPyの数値・配列や文字列以外の辞書キーもそのまま扱い、
+    orjsonが変換できない型は Flask標準プロバイダーの変換処理にフォールバックする。
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        オブジェクトをJSON文字列に変換する
+
+        Args:
+            obj: 変換するオブジェクト
+            **kwargs: json.dumps 互換の引数 (indent, sort_keys のみ反映)
+
+        Returns:
+            JSON文字列
+        """
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """
+        JSON文字列をオブジェクトに変換する
+
+        Args:
+            s: JSON文字列またはバイト列
+            **kwargs: json.loads 互換の引数 (未使用)
+
+        Returns:
+            変換したオブジェクト
+        """
+        return orjson.loads(s)
@@ -11,11 +11,58 @@ from .data_processor import DataProcessor
 
 logger = logging.getLogger(__name__)
 
+# 初回リピートまでの日数の期間区分: 各区分の上限日数 (以下) とラベル。上限を超えると最後の区分
+REPEAT_PERIOD_UPPER_DAYS = [7, 14, 30, 60, 90]
+REPEAT_PERIOD_LABELS = ['1週間以内', '2週間以内', '1ヶ月以内', '2ヶ月以内', '3ヶ月以内', '3ヶ月以上']
+
 class RepeatAnalyzer:
     """リピート分析クラス"""
     
     def __init__(self):
         self.data_processor = DataProcessor()
+        # analyze_repeat_customers が参照するカラム ('年代' はオプション)
+        self.analysis_columns = ['顧客ID', '来店日', 'ステータス', 'このサロンに行くのは初めてですか？',
+                                 'スタイリスト名', '予約時HotPepperBeautyクーポン',
+                                 '予約時合計金額', '性別', '予約時メニュー', '年代']
+
+    def select_analysis_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        分析に必要なカラムだけに絞り込む
+
+        アップロード時に一度だけ射影しておくことで、キャッシュに保存するデータ量と
+        分析時の復元コストを抑える。
+
+        Args:
+            df: 全来店データ
+
+        Returns:
+            分析対象カラムのみのデータフレーム
+        """
+        columns = [col for col in self.analysis_columns if col in df.columns]
+        return df[columns]
+
+    def sort_visits(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        来店データを (顧客ID, 来店日) 順に並べ替える
+
+        アップロード時に一度並べ替えてキャッシュしておくことで、分析時の行順を固定する
+        (get_new_customers は同一顧客の初回来店日が重複する場合に行順で先頭を選ぶ)。
+
+        Args:
+            df: 来店データ
+
+        Returns:
+            (顧客ID, 来店日) 順に並べ替えたデータフレーム
+        """
+        if self._is_sorted_by_customer_and_date(df):
+            return df
+        return df.sort_values(['顧客ID', '来店日'], kind='mergesort').reset_index(drop=True)
+
+    def _is_sorted_by_customer_and_date(self, df: pd.DataFrame) -> bool:
+        """データフレームが (顧客ID, 来店日) 順に並んでいるかを判定する"""
+        if df.empty:
+            return True
+        return pd.MultiIndex.from_arrays([df['顧客ID'], df['来店日']]).is_monotonic_increasing
     
     def analyze_repeat_customers(self, 
                                df: pd.DataFrame,
@@ -42,6 +89,39 @@ class RepeatAnalyzer:
         Returns:
             分析結果辞書
         """
+        new_customers, repeat_data = self.extract_repeat_data(
+            df, new_customer_start, new_customer_end, repeat_analysis_end
+        )
+        return self.summarize_repeat_data(
+            new_customers, repeat_data,
+            new_customer_start, new_customer_end, repeat_analysis_end,
+            min_repeat_count=min_repeat_count,
+            min_stylist_customers=min_stylist_customers,
+            min_coupon_customers=min_coupon_customers,
+            target_rates=target_rates
+        )
+
+    def extract_repeat_data(self,
+                            df: pd.DataFrame,
+                            new_customer_start: str,
+                            new_customer_end: str,
+                            repeat_analysis_end: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        新規顧客を抽出し、顧客ごとのリピート状況を求める (分析のうち重い処理)
+
+        結果は期間の指定だけで決まり、基準回数・最低顧客数・目標値には依存しない。
+        そのため呼び出し側で保持しておけば、これらの設定を変えた再分析では
+        summarize_repeat_data だけを実行すればよい (返すデータフレームは変更しないこと)。
+
+        Args:
+            df: 全来店データ
+            new_customer_start: 新規顧客抽出開始日 (YYYY-MM-DD)
+            new_customer_end: 新規顧客抽出終了日 (YYYY-MM-DD)
+            repeat_analysis_end: リピート集計終了日 (YYYY-MM-DD)
+
+        Returns:
+            (新規顧客データ, リピートデータ) のタプル。新規顧客がいない場合、リピートデータは空
+        """
         logger.info("リピート分析開始")
 
         # 入力DataFrameの検証
@@ -63,22 +143,65 @@ class RepeatAnalyzer:
             "new_customer_end": new_customer_end,
             "repeat_analysis_end": repeat_analysis_end
         }
+        parsed_dates = {}
         for param_name, date_str in date_params.items():
             try:
-                pd.to_datetime(date_str) # datetimeに変換可能かチェック
+                parsed_dates[param_name] = pd.to_datetime(date_str) # datetimeに変換可能かチェック (変換結果は以下の比較に使う)
             except ValueError:
                 logger.error(f"日付パラメータ '{param_name}' の形式が不正です: {date_str}。YYYY-MM-DD形式で指定してください。")
                 raise ValueError(f"日付パラメータ '{param_name}' の形式が不正です: {date_str}。YYYY-MM-DD形式で指定してください。")
 
-        if pd.to_datetime(new_customer_start) > pd.to_datetime(new_customer_end):
+        if parsed_dates["new_customer_start"] > parsed_dates["new_customer_end"]:
             logger.error("新規顧客抽出開始日は新規顧客抽出終了日より前の日付である必要があります。")
             raise ValueError("新規顧客抽出開始日は新規顧客抽出終了日より前の日付である必要があります。")
-        if pd.to_datetime(new_customer_end) > pd.to_datetime(repeat_analysis_end):
+        if parsed_dates["new_customer_end"] > parsed_dates["repeat_analysis_end"]:
             logger.error("新規顧客抽出終了日はリピート集計終了日より前の日付である必要があります。") # 通常は同日か前
             # このチェックは要件によるが、一般的にはリピート集計は新規抽出期間の後なので警告に留めるか、より厳密なロジックが必要か検討
             # raise ValueError("新規顧客抽出終了日はリピート集計終了日より前の日付である必要があります。")
 
 
+        # 新規顧客抽出
+        # DataProcessor.get_new_customers は '顧客ID' と '来店日' (初回来店日) を含む new_customers DataFrame を返す想定
+        new_customers = self.data_processor.get_new_customers(
+            df, new_customer_start, new_customer_end
+        )
+        if len(new_customers) == 0:
+            return new_customers, pd.DataFrame()
+
+        # リピート状況分析
+        # _analyze_repeat_patterns は new_customers から '顧客ID' と '来店日' (初回来店日) を使用する
+        repeat_data = self._analyze_repeat_patterns(
+            df, new_customers, repeat_analysis_end
+        )
+        return new_customers, repeat_data
+
+    def summarize_repeat_data(self,
+                              new_customers: pd.DataFrame,
+                              repeat_data: pd.DataFrame,
+                              new_customer_start: str,
+                              new_customer_end: str,
+                              repeat_analysis_end: str,
+                              min_repeat_count: int = 3,
+                              min_stylist_customers: int = 10,
+                              min_coupon_customers: int = 5,
+                              target_rates: Dict[str, float] = None) -> Dict:
+        """
+        extract_repeat_data の結果から各種分析を行い、分析結果辞書にまとめる
+
+        Args:
+            new_customers: 新規顧客データ (extract_repeat_data の出力)
+            repeat_data: リピートデータ (extract_repeat_data の出力)
+            new_customer_start: 新規顧客抽出開始日 (YYYY-MM-DD)
+            new_customer_end: 新規顧客抽出終了日 (YYYY-MM-DD)
+            repeat_analysis_end: リピート集計終了日 (YYYY-MM-DD)
+            min_repeat_count: X回以上リピートの基準回数
+            min_stylist_customers: スタイリスト分析の最低顧客数
+            min_coupon_customers: クーポン分析の最低顧客数
+            target_rates: 目標値辞書
+
+        Returns:
+            分析結果辞書
+        """
         if target_rates is None:
             target_rates = {
                 'first_repeat': 35.0,
@@ -86,12 +209,6 @@ class RepeatAnalyzer:
                 'third_repeat': 60.0
             }
         
-        # 新規顧客抽出
-        # DataProcessor.get_new_customers は '顧客ID' と '来店日' (初回来店日) を含む new_customers DataFrame を返す想定
-        new_customers = self.data_processor.get_new_customers(
-            df, new_customer_start, new_customer_end
-        )
-        
         if len(new_customers) == 0:
             logger.warning("指定期間に新規顧客が見つかりませんでした。分析結果は空になります。")
             # 空の結果を返すか、エラーとするかは仕様による。ここでは空の結果を許容する。
@@ -109,21 +226,16 @@ class RepeatAnalyzer:
                 }
             }
             return empty_analysis_results
-
-        
-        # リピート状況分析
-        # _analyze_repeat_patterns は new_customers から '顧客ID' と '来店日' (初回来店日) を使用する
-        repeat_data = self._analyze_repeat_patterns(
-            df, new_customers, repeat_analysis_end
-        )
         
-        # 各種分析実行
+        # 各種分析実行 (リピート回数のヒストグラムは一度だけ求めて各分析で共有する)
+        repeat_histogram = self._precompute_repeat_histogram(repeat_data)
         results = {
-            'basic_stats': self._calculate_basic_stats(repeat_data, min_repeat_count),
-            'funnel_analysis': self._analyze_repeat_funnel(repeat_data),
-            'stylist_analysis': self._analyze_by_stylist(repeat_data, min_stylist_customers, min_repeat_count),
+            'basic_stats': self._calculate_basic_stats(repeat_data, min_repeat_count, repeat_histogram),
+            'funnel_analysis': self._analyze_repeat_funnel(repeat_data, repeat_histogram),
+            'stylist_analysis': self._analyze_by_stylist(repeat_data, min_stylist_customers, min_repeat_count,
+                                                         repeat_histogram),
             'coupon_analysis': self._analyze_by_coupon(repeat_data, min_coupon_customers, min_repeat_count),
-            'target_comparison': self._compare_with_targets(repeat_data, target_rates),
+            'target_comparison': self._compare_with_targets(repeat_data, target_rates, repeat_histogram),
             'period_analysis': self._analyze_repeat_periods(repeat_data),
             'monthly_analysis': self._analyze_monthly_trends(new_customers, repeat_data),
             'parameters': {
@@ -153,7 +265,7 @@ class RepeatAnalyzer:
             analysis_end_date: 分析終了日 (YYYY-MM-DD形式の文字列)
             
         Returns:
-            リピートデータ (顧客ID, 初回来店日, リピート回数, リピート日付リスト, 初回リピート日数, etc.)
+            リピートデータ (顧客ID, 初回来店日, リピート回数, 初回リピート日数, etc.)
         """
         logger.info("リピートパターン分析開始（効率化版）")
         
@@ -189,80 +301,62 @@ class RepeatAnalyzer:
         if '年代' in new_customers.columns: # 年代カラムが存在すれば含める
             nc_cols_to_select.append('年代')
 
-        nc_df = new_customers[nc_cols_to_select].copy()
+        # カラムの選択・リネームで新しいデータフレームになるため、別途 .copy() はしない
+        nc_df = new_customers[nc_cols_to_select].rename(columns={'来店日': '初回来店日', 
+                                                                 '予約時HotPepperBeautyクーポン': '初回クーポン',
+                                                                 '予約時メニュー': '初回メニュー',
+                                                                 '予約時合計金額': '初回金額'})
         
-        nc_df.rename(columns={'来店日': '初回来店日', 
-                              '予約時HotPepperBeautyクーポン': '初回クーポン',
-                              '予約時メニュー': '初回メニュー',
-                              '予約時合計金額': '初回金額'}, inplace=True)
-        
-        # 年代カラムの処理 (nc_cols_to_select で '年代' が含まれていれば既にコピーされている)
+        # 年代カラムの処理 (nc_cols_to_select で '年代' が含まれていれば既に選択されている)
         # rename後も '年代' のままなので、もし '年代' がなかった場合は '不明' で作成
         if '年代' not in nc_df.columns: # new_customers に '年代' がなかった場合
             nc_df['年代'] = '不明'
 
 
-        # 全データから新規顧客の来店記録のみを対象とする
-        relevant_visits = all_data[all_data['顧客ID'].isin(nc_df['顧客ID'])].copy()
-        
-        # 来店日をdatetime型に変換 (エラーチェック済みのはずだが念のため)
-        relevant_visits['来店日'] = pd.to_datetime(relevant_visits['来店日'])
-        nc_df['初回来店日'] = pd.to_datetime(nc_df['初回来店日'])
-
         # リピート訪問の定義：
         # 1. 新規顧客の初回来店日より後の訪問
         # 2. 分析終了日以前の訪問
         # 3. ステータスが '済み'
+
+        # 全データから分析終了日以前の '済み' の来店記録 (条件2・3) を、判定に必要なカラムに絞って取り出し、
+        # そのうち新規顧客のものだけを残す
+        # 初回来店日は通常 datetime型のまま渡されるので、そうでない場合のみ変換する
+        if not pd.api.types.is_datetime64_any_dtype(nc_df['初回来店日']):
+            nc_df['初回来店日'] = pd.to_datetime(nc_df['初回来店日'], cache=True)
+        is_candidate = (all_data['ステータス'] == '済み') & (all_data['来店日'] <= end_dt)
+        relevant_visits = all_data.loc[is_candidate, ['顧客ID', '来店日']]
+        relevant_visits = relevant_visits[relevant_visits['顧客ID'].isin(nc_df['顧客ID'])]
+
+        # 各来店の顧客の初回来店日を顧客IDで引く
+        # (新規顧客の顧客IDは一意なので、結合せずに顧客IDの位置から取り出す)
+        customer_positions = pd.Index(nc_df['顧客ID']).get_indexer(relevant_visits['顧客ID'])
+        first_visit_dates = nc_df['初回来店日'].to_numpy()[customer_positions]
         
-        # relevant_visits と nc_df (初回来店日情報を持つ) をマージ
-        merged_visits = pd.merge(relevant_visits, nc_df[['顧客ID', '初回来店日']], on='顧客ID', how='left')
-        
-        # リピート訪問をフィルタリング
-        repeat_visits_df = merged_visits[
-            (merged_visits['来店日'] > merged_visits['初回来店日']) &
-            (merged_visits['来店日'] <= end_dt) &
-            (merged_visits['ステータス'] == '済み')
-        ].copy()
+        # リピート訪問 (条件1: 初回来店日より後) をフィルタリング
+        repeat_visits_df = relevant_visits[relevant_visits['来店日'] > first_visit_dates]
         
         if repeat_visits_df.empty:
             logger.info("リピート訪問データがありません。")
             # リピートがない顧客も含めるために、nc_dfをベースに結果を構築
-            result_df = nc_df.copy()
+            result_df = nc_df
             result_df['リピート回数'] = 0
-            result_df['リピート日付リスト'] = [[] for _ in range(len(result_df))]
             result_df['初回リピート日数'] = np.nan
             logger.info(f"リピートパターン分析完了（リピートなし）: {len(result_df)}人")
-            return result_df.set_index('顧客ID').reset_index() # 念のためインデックスをリセット
-
-        # 来店日でソート
-        repeat_visits_df = repeat_visits_df.sort_values(['顧客ID', '来店日'])
-        
-        # 顧客ごとにリピート情報を集約
-        agg_funcs = {
-            '来店日': [
-                ('リピート日付リスト', lambda x: list(x)),
-                ('初回リピート日', 'first'),
-                ('リピート回数', 'count')
-            ]
-        }
-        grouped_repeats = repeat_visits_df.groupby('顧客ID').agg(agg_funcs)
-        
-        # マルチインデックスのカラムをフラット化
-        grouped_repeats.columns = ['_'.join(col).strip('_') for col in grouped_repeats.columns.values]
-        grouped_repeats.rename(columns={'来店日_リピート日付リスト': 'リピート日付リスト',
-                                      '来店日_初回リピート日': '初回リピート日',
-                                      '来店日_リピート回数': 'リピート回数'}, inplace=True)
-        grouped_repeats.reset_index(inplace=True)
+            return self._downcast_repeat_data(result_df.set_index('顧客ID').reset_index()) # 念のためインデックスをリセット
+
+        # 顧客ごとにリピート回数と初回リピート日 (最小の来店日) を集約する。
+        # min を使うので来店日順に並べ替える必要はない
+        grouped_repeats = repeat_visits_df.groupby('顧客ID', observed=True).agg(
+            リピート回数=('来店日', 'size'),
+            初回リピート日=('来店日', 'min')
+        ).reset_index()
 
         # nc_df と grouped_repeats をマージして、全新規顧客にリピート情報を付与
         # リピートがない顧客は NaN になるので、後で処理
         result_df = pd.merge(nc_df, grouped_repeats, on='顧客ID', how='left')
         
-        # リピートがない顧客の 'リピート回数' を 0 に、'リピート日付リスト' を空リストに
-        result_df['リピート回数'].fillna(0, inplace=True)
-        result_df['リピート回数'] = result_df['リピート回数'].astype(int) # 整数型に
-        # result_df['リピート日付リスト'].fillna([[] for _ in range(len(result_df))], inplace=True) # fillna に list は使えない
-        result_df['リピート日付リスト'] = result_df['リピート日付リスト'].apply(lambda x: x if isinstance(x, list) else [])
+        # リピートがない顧客の 'リピート回数' を 0 に
+        result_df['リピート回数'] = result_df['リピート回数'].fillna(0).astype(int) # 整数型に
 
         # 初回リピート日数を計算
         result_df['初回リピート日数'] = (result_df['初回リピート日'] - result_df['初回来店日']).dt.days
@@ -278,10 +372,10 @@ class RepeatAnalyzer:
         result_df = result_df.set_index('顧客ID').reset_index()
         
         # 想定されるカラム順に並び替え (任意、可読性のため)
-        # '顧客ID', '初回来店日', 'リピート回数', 'リピート日付リスト', '初回リピート日数', 
+        # '顧客ID', '初回来店日', 'リピート回数', '初回リピート日数', 
         # 'スタイリスト名', '初回クーポン', '性別', '年代', '初回メニュー', '初回金額'
         expected_columns = ['顧客ID', '初回来店日', 'スタイリスト名', '初回クーポン', '性別', '年代', '初回メニュー', '初回金額',
-                            'リピート回数', 'リピート日付リスト', '初回リピート日数']
+                            'リピート回数', '初回リピート日数']
         # 存在するカラムのみで並び替え
         final_columns = [col for col in expected_columns if col in result_df.columns]
         # 存在しないカラムがexpected_columnsにある場合、それ以外のカラムも追加
@@ -289,7 +383,30 @@ class RepeatAnalyzer:
             if col not in final_columns:
                 final_columns.append(col)
 
-        return result_df[final_columns]
+        return self._downcast_repeat_data(result_df[final_columns])
+
+    def _downcast_repeat_data(self, repeat_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        リピートデータのカラムを値を損なわない範囲で小さい型に変換する
+
+        リピートデータは期間の指定ごとにプロセス内に保持されるため、回数・日数は小さい数値型に、
+        文字列の属性 (年代・初回メニューなど) はカテゴリ型にしてメモリ使用量を抑える。
+
+        Args:
+            repeat_df: リピートデータ
+
+        Returns:
+            型を縮小したリピートデータ
+        """
+        downcast_columns = {'リピート回数': pd.to_numeric(repeat_df['リピート回数'], downcast='integer')}
+        # 日数は float32 で値が変わらない場合のみ縮小する (pd.to_numeric(downcast='float') は誤差のある変換も許容する)
+        first_repeat_days = repeat_df['初回リピート日数']
+        downcast_days = first_repeat_days.astype('float32')
+        if downcast_days.astype(first_repeat_days.dtype).equals(first_repeat_days):
+            downcast_columns['初回リピート日数'] = downcast_days
+        for col in repeat_df.select_dtypes(include='object').columns:
+            downcast_columns[col] = repeat_df[col].astype('category')
+        return repeat_df.assign(**downcast_columns)
     
     def _calculate_age_group(self, customer_row) -> str:
         """年代を計算（簡易版）"""
@@ -300,16 +417,39 @@ class RepeatAnalyzer:
             return customer_row['年代']
         return "不明"
     
-    def _calculate_basic_stats(self, repeat_df: pd.DataFrame, min_repeat_count: int) -> Dict:
-        """基本統計の計算"""
+    def _precompute_repeat_histogram(self, repeat_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        リピート回数のヒストグラムと「k回以上」の累積人数を1回の走査で求める
+
+        Args:
+            repeat_df: リピートデータ
+
+        Returns:
+            (counts, ge) のタプル。counts[k] はリピート回数がちょうどk回の人数、
+            ge[k] はk回以上の人数 (範囲外のkは _count_at_least で参照する)
+        """
+        counts = np.bincount(repeat_df['リピート回数'].to_numpy(dtype=np.int64), minlength=1)
+        ge = counts[::-1].cumsum()[::-1]
+        return counts, ge
+
+    def _count_at_least(self, ge: np.ndarray, k: int) -> int:
+        """リピート回数がk回以上の人数を累積人数の配列から取り出す"""
+        if k >= len(ge):
+            return 0
+        return int(ge[max(k, 0)])
+
+    def _calculate_basic_stats(self, repeat_df: pd.DataFrame, min_repeat_count: int,
+                               repeat_histogram: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+        """基本統計の計算 (repeat_histogram は _precompute_repeat_histogram の結果。省略時はここで求める)"""
         total_new_customers = len(repeat_df)
+        _, ge = repeat_histogram or self._precompute_repeat_histogram(repeat_df)
         
         # X回以上リピート
-        x_plus_repeaters = len(repeat_df[repeat_df['リピート回数'] >= min_repeat_count])
+        x_plus_repeaters = self._count_at_least(ge, min_repeat_count)
         x_plus_rate = (x_plus_repeaters / total_new_customers * 100) if total_new_customers > 0 else 0
         
         # 初回リピート
-        first_repeaters = len(repeat_df[repeat_df['リピート回数'] >= 1])
+        first_repeaters = self._count_at_least(ge, 1)
         first_repeat_rate = (first_repeaters / total_new_customers * 100) if total_new_customers > 0 else 0
         
         # 平均リピート回数
@@ -327,17 +467,19 @@ class RepeatAnalyzer:
             'min_repeat_count': min_repeat_count
         }
     
-    def _analyze_repeat_funnel(self, repeat_df: pd.DataFrame) -> Dict:
-        """リピートファネル分析"""
+    def _analyze_repeat_funnel(self, repeat_df: pd.DataFrame,
+                               repeat_histogram: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+        """リピートファネル分析 (repeat_histogram は _precompute_repeat_histogram の結果。省略時はここで求める)"""
         total_customers = len(repeat_df)
+        counts, ge = repeat_histogram or self._precompute_repeat_histogram(repeat_df)
         
         # 各ステージの顧客数
         stages = {
             '新規来店': total_customers,
-            '2回目来店': len(repeat_df[repeat_df['リピート回数'] >= 1]),
-            '3回目来店': len(repeat_df[repeat_df['リピート回数'] >= 2]),
-            '4回目来店': len(repeat_df[repeat_df['リピート回数'] >= 3]),
-            '5回目来店': len(repeat_df[repeat_df['リピート回数'] >= 4])
+            '2回目来店': self._count_at_least(ge, 1),
+            '3回目来店': self._count_at_least(ge, 2),
+            '4回目来店': self._count_at_least(ge, 3),
+            '5回目来店': self._count_at_least(ge, 4)
         }
         
         # 継続率計算
@@ -359,26 +501,72 @@ class RepeatAnalyzer:
         for stage, count in stages.items():
             stage_rates[stage] = round((count / total_customers * 100), 1) if total_customers > 0 else 0
         
-        # リピート回数分布
-        repeat_distribution = repeat_df['リピート回数'].value_counts().sort_index()
+        # リピート回数分布 (該当者のいる回数のみ、回数順)
+        observed_counts = np.flatnonzero(counts)
+        repeat_distribution = {int(k): int(counts[k]) for k in observed_counts}
         
         # 累積割合
-        cumulative_percentages = {}
-        cumulative_count = 0
-        for repeat_count in sorted(repeat_distribution.index):
-            cumulative_count += repeat_distribution[repeat_count]
-            cumulative_percentages[repeat_count] = round((cumulative_count / total_customers * 100), 1)
+        cumulative_counts = counts.cumsum()
+        cumulative_percentages = {
+            int(k): round((cumulative_counts[k] / total_customers * 100), 1) for k in observed_counts
+        }
         
         return {
             'stages': stages,
             'stage_rates': stage_rates,
             'continuation_rates': continuation_rates,
-            'repeat_distribution': repeat_distribution.to_dict(),
+            'repeat_distribution': repeat_distribution,
             'cumulative_percentages': cumulative_percentages
         }
     
-    def _analyze_by_stylist(self, repeat_df: pd.DataFrame, min_customers: int, min_repeat_count: int) -> Dict:
-        """スタイリスト別分析"""
+    def _fill_blank_labels(self, series: pd.Series, label: str) -> pd.Series:
+        """
+        欠損値・空文字を指定ラベルに置き換える (カテゴリ型の場合はカテゴリを追加してから置換)
+
+        カテゴリ型の groupby はカテゴリの並び順でグループを返すため、カテゴリは名前順に並べ直す
+        (追加したラベルが末尾になったり、CSVの出現順のままになったりすると、
+        率が同じグループの順位が文字列型の場合と変わってしまう)。
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if label not in series.cat.categories:
+                series = series.cat.add_categories(label)
+            series = series.cat.reorder_categories(sorted(series.cat.categories))
+            series = series.fillna(label)
+            return series.where(series != '', label)
+        return series.fillna(label).replace('', label)
+
+    def _aggregate_repeat_groups(self, repeat_df: pd.DataFrame, group_labels: pd.Series,
+                                 min_customers: int, min_repeat_count: int) -> pd.DataFrame:
+        """
+        グループ (スタイリスト・クーポン) ごとのリピート集計を1回のgroupbyで行う
+
+        Args:
+            repeat_df: リピートデータ
+            group_labels: 各顧客のグループ名 (repeat_df と同じインデックス)
+            min_customers: 最低顧客数 (未満のグループは除外する)
+            min_repeat_count: X回以上リピートの基準回数
+
+        Returns:
+            グループ名をインデックスとし、total_customers, x_plus_repeaters, first_repeaters,
+            repeat_sum (リピート回数の合計) を持つデータフレーム (グループ名順)
+        """
+        repeat_counts = repeat_df['リピート回数']
+        flags = pd.DataFrame({
+            'repeat_count': repeat_counts,
+            'is_x_plus': repeat_counts >= min_repeat_count,
+            'is_repeater': repeat_counts >= 1
+        })
+        group_stats = flags.groupby(group_labels, observed=True).agg(
+            total_customers=('repeat_count', 'size'),
+            x_plus_repeaters=('is_x_plus', 'sum'),
+            first_repeaters=('is_repeater', 'sum'),
+            repeat_sum=('repeat_count', 'sum')
+        )
+        return group_stats[group_stats['total_customers'] >= min_customers]
+
+    def _analyze_by_stylist(self, repeat_df: pd.DataFrame, min_customers: int, min_repeat_count: int,
+                            repeat_histogram: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+        """スタイリスト別分析 (repeat_histogram は _precompute_repeat_histogram の結果。省略時はここで求める)"""
         stylist_stats = []
         
         # スタイリスト名の前処理: _analyze_repeat_patterns で 'スタイリスト名' が付与されている前提
@@ -386,24 +574,17 @@ class RepeatAnalyzer:
             logger.warning("スタイリスト別分析: repeat_dfにスタイリスト名カラムがありません。")
             return {"error": "スタイリスト名カラムがありません"}
 
-        repeat_df['スタイリスト名_clean'] = repeat_df['スタイリスト名'].fillna('不明').replace('', '不明')
+        stylist_names = self._fill_blank_labels(repeat_df['スタイリスト名'], '不明')
         
-        stylist_groups = repeat_df.groupby('スタイリスト名_clean')
+        # 最低顧客数フィルタ済みのスタイリスト別集計
+        group_stats = self._aggregate_repeat_groups(repeat_df, stylist_names, min_customers, min_repeat_count)
         
-        for stylist_name, group in stylist_groups:
-            total_customers = len(group)
-            
-            # 最低顧客数フィルタ
-            if total_customers < min_customers:
-                continue
-            
-            x_plus_repeaters = len(group[group['リピート回数'] >= min_repeat_count])
+        for stylist_name, total_customers, x_plus_repeaters, first_repeaters, repeat_sum in zip(
+                group_stats.index, group_stats['total_customers'].tolist(), group_stats['x_plus_repeaters'].tolist(),
+                group_stats['first_repeaters'].tolist(), group_stats['repeat_sum'].tolist()):
             x_plus_rate = (x_plus_repeaters / total_customers * 100) if total_customers > 0 else 0
-            
-            first_repeaters = len(group[group['リピート回数'] >= 1])
             first_repeat_rate = (first_repeaters / total_customers * 100) if total_customers > 0 else 0
-            
-            avg_repeat = group['リピート回数'].mean()
+            avg_repeat = np.float64(repeat_sum) / total_customers
             
             stylist_stats.append({
                 'stylist_name': stylist_name,
@@ -426,7 +607,8 @@ class RepeatAnalyzer:
         }
         
         # 全体でのX回以上リピーター数
-        total_x_plus = len(repeat_df[repeat_df['リピート回数'] >= min_repeat_count])
+        _, ge = repeat_histogram or self._precompute_repeat_histogram(repeat_df)
+        total_x_plus = self._count_at_least(ge, min_repeat_count)
         
         return {
             'stylist_stats': stylist_stats,
@@ -444,26 +626,19 @@ class RepeatAnalyzer:
             logger.warning("クーポン別分析: repeat_dfに初回クーポンカラムがありません。")
             return {"error": "初回クーポンカラムがありません"}
 
-        repeat_df['初回クーポン_clean'] = repeat_df['初回クーポン'].fillna('なし').replace('', 'なし')
+        coupon_names = self._fill_blank_labels(repeat_df['初回クーポン'], 'なし')
         
-        coupon_groups = repeat_df.groupby('初回クーポン_clean')
+        # 最低顧客数フィルタ済みのクーポン別集計
+        group_stats = self._aggregate_repeat_groups(repeat_df, coupon_names, min_customers, min_repeat_count)
         
-        for coupon_name, group in coupon_groups:
-            total_customers = len(group)
-            
-            # 最低顧客数フィルタ
-            if total_customers < min_customers:
-                continue
-            
-            x_plus_repeaters = len(group[group['リピート回数'] >= min_repeat_count])
+        for coupon_name, total_customers, x_plus_repeaters, first_repeaters, repeat_sum in zip(
+                group_stats.index, group_stats['total_customers'].tolist(), group_stats['x_plus_repeaters'].tolist(),
+                group_stats['first_repeaters'].tolist(), group_stats['repeat_sum'].tolist()):
             x_plus_rate = (x_plus_repeaters / total_customers * 100) if total_customers > 0 else 0
-            
-            first_repeaters = len(group[group['リピート回数'] >= 1])
             first_repeat_rate = (first_repeaters / total_customers * 100) if total_customers > 0 else 0
             
-            # リピーターのみの平均リピート回数
-            repeaters_only = group[group['リピート回数'] > 0]
-            avg_repeat_repeaters = repeaters_only['リピート回数'].mean() if len(repeaters_only) > 0 else 0
+            # リピーターのみの平均リピート回数 (リピートなしの顧客は合計に寄与しない)
+            avg_repeat_repeaters = np.float64(repeat_sum) / first_repeaters if first_repeaters > 0 else 0
             
             coupon_stats.append({
                 'coupon_name': coupon_name,
@@ -492,21 +667,23 @@ class RepeatAnalyzer:
             'min_customers_filter': min_customers
         }
     
-    def _compare_with_targets(self, repeat_df: pd.DataFrame, target_rates: Dict[str, float]) -> Dict:
-        """目標値比較分析"""
+    def _compare_with_targets(self, repeat_df: pd.DataFrame, target_rates: Dict[str, float],
+                              repeat_histogram: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+        """目標値比較分析 (repeat_histogram は _precompute_repeat_histogram の結果。省略時はここで求める)"""
         total_customers = len(repeat_df)
+        _, ge = repeat_histogram or self._precompute_repeat_histogram(repeat_df)
         
         # 実績値計算
         actual_rates = {
-            'first_repeat': len(repeat_df[repeat_df['リピート回数'] >= 1]) / total_customers * 100 if total_customers > 0 else 0,
+            'first_repeat': self._count_at_least(ge, 1) / total_customers * 100 if total_customers > 0 else 0,
             'second_repeat': 0,  # 3回目来店/2回目来店の計算が必要
             'third_repeat': 0    # 4回目来店/3回目来店の計算が必要
         }
         
         # 継続率の正確な計算
-        second_visit_customers = len(repeat_df[repeat_df['リピート回数'] >= 1])
-        third_visit_customers = len(repeat_df[repeat_df['リピート回数'] >= 2])
-        fourth_visit_customers = len(repeat_df[repeat_df['リピート回数'] >= 3])
+        second_visit_customers = self._count_at_least(ge, 1)
+        third_visit_customers = self._count_at_least(ge, 2)
+        fourth_visit_customers = self._count_at_least(ge, 3)
         
         if second_visit_customers > 0:
             actual_rates['second_repeat'] = (third_visit_customers / second_visit_customers) * 100
@@ -526,7 +703,7 @@ class RepeatAnalyzer:
         # 必要な追加顧客数計算
         required_additional = {}
         current_counts = {
-            'first_repeat': len(repeat_df[repeat_df['リピート回数'] >= 1]),
+            'first_repeat': second_visit_customers,
             'second_repeat': third_visit_customers,
             'third_repeat': fourth_visit_customers
         }
@@ -566,51 +743,33 @@ class RepeatAnalyzer:
                 'period_distribution': {}
             }
 
-        # NaNを除外したコピーで計算（元データに影響を与えないように）
-        repeat_customers_with_days = repeat_df[repeat_df['初回リピート日数'].notna()].copy()
+        # NaN (リピートなし) を除外した配列を一度だけ作り、統計量と期間区分の両方に使う
+        repeat_days = repeat_df['初回リピート日数'].to_numpy(dtype=np.float64)
+        repeat_days = repeat_days[~np.isnan(repeat_days)]
 
-        if repeat_customers_with_days.empty:
+        if repeat_days.size == 0:
             logger.info("リピート顧客が存在しないか、初回リピート日数がすべてNaNです。")
             return {
                 'avg_days': 0, 'median_days': 0, 'min_days': 0, 'max_days': 0,
                 'period_distribution': {}
             }
 
-        avg_days = repeat_customers_with_days['初回リピート日数'].mean()
-        median_days = repeat_customers_with_days['初回リピート日数'].median()
-        min_days = repeat_customers_with_days['初回リピート日数'].min()
-        max_days = repeat_customers_with_days['初回リピート日数'].max()
-
-        def categorize_period(days_val):
-            if pd.isna(days_val):
-                return '不明'
-            if days_val <= 7:
-                return '1週間以内'
-            elif days_val <= 14:
-                return '2週間以内'
-            elif days_val <= 30:
-                return '1ヶ月以内'
-            elif days_val <= 60:
-                return '2ヶ月以内'
-            elif days_val <= 90:
-                return '3ヶ月以内'
-            else:
-                return '3ヶ月以上'
+        avg_days = repeat_days.mean()
+        median_days = np.median(repeat_days)
+        min_days = repeat_days.min()
+        max_days = repeat_days.max()
 
-        # .locを使用してSettingWithCopyWarningを回避
-        repeat_customers_with_days.loc[:, '期間区分'] = repeat_customers_with_days['初回リピート日数'].apply(categorize_period)
-        
-        period_distribution = repeat_customers_with_days['期間区分'].value_counts(normalize=True) * 100
-        period_distribution_counts = repeat_customers_with_days['期間区分'].value_counts()
+        # 各日数が入る期間区分の番号を二分探索で求め、区分ごとの人数を数える
+        period_indices = np.searchsorted(REPEAT_PERIOD_UPPER_DAYS, repeat_days, side='left')
+        period_counts = np.bincount(period_indices, minlength=len(REPEAT_PERIOD_LABELS))
+        period_percentages = period_counts / period_counts.sum() * 100
 
-        distribution_dict = {
-            cat: {'count': int(period_distribution_counts.get(cat, 0)), 
-                  'percentage': round(float(period_distribution.get(cat, 0.0)), 1)}
-            for cat in period_distribution.index
+        # 期間区分の順に、該当者のいる区分のみ
+        sorted_distribution = {
+            label: {'count': int(count), 'percentage': round(float(percentage), 1)}
+            for label, count, percentage in zip(REPEAT_PERIOD_LABELS, period_counts, period_percentages)
+            if count > 0
         }
-        # 期間区分の順序を定義
-        defined_order = ['1週間以内', '2週間以内', '1ヶ月以内', '2ヶ月以内', '3ヶ月以内', '3ヶ月以上', '不明']
-        sorted_distribution = {cat: distribution_dict[cat] for cat in defined_order if cat in distribution_dict}
 
         return {
             'avg_days': round(float(avg_days), 1) if pd.notna(avg_days) else 0.0,
@@ -622,31 +781,38 @@ class RepeatAnalyzer:
     
     def _analyze_monthly_trends(self, new_customers: pd.DataFrame, repeat_df: pd.DataFrame) -> Dict:
         """月別トレンド分析"""
-        # 新規顧客の月別集計
-        new_customers['年月'] = new_customers['来店日'].dt.to_period('M')
-        monthly_new = new_customers.groupby('年月').size()
-        
-        # リピートデータに年月を追加
-        repeat_with_month = repeat_df.merge(
-            new_customers[['顧客ID', '年月']],
-            on='顧客ID',
-            how='left'
-        )
+        # 新規顧客の月別集計 (new_customers は呼び出し側で再利用されるため、カラムを追加しない)
+        # 年月は datetime64[M] の整数値 (1970-01 からの月数) をキーにし、ラベル ('YYYY-MM') は最後にまとめて作る
+        new_customer_months = new_customers['来店日'].to_numpy(dtype='datetime64[M]').view(np.int64)
+        month_keys, monthly_new = np.unique(new_customer_months, return_counts=True)
+        month_labels = np.datetime_as_string(month_keys.view('datetime64[M]'), unit='M').tolist()
+        
+        # リピートデータの各顧客の年月 (キーの番号)
+        # リピートデータは新規顧客の初回来店日を持つので、新規顧客データを引き直さずにそこから年月を求める
+        repeat_months = repeat_df['初回来店日'].to_numpy(dtype='datetime64[M]').view(np.int64)
+        repeat_month_ids = np.searchsorted(month_keys, repeat_months)
+        # 新規顧客データにない年月の顧客は集計しない
+        found = repeat_month_ids < len(month_keys)
+        found[found] = month_keys[repeat_month_ids[found]] == repeat_months[found]
+        repeat_month_ids = repeat_month_ids[found]
+        is_repeater = repeat_df['リピート回数'].to_numpy()[found] >= 1
+        monthly_totals = np.bincount(repeat_month_ids, minlength=len(month_keys))
+        monthly_repeaters = np.bincount(repeat_month_ids[is_repeater], minlength=len(month_keys))
         
         # 月別初回リピート率
         monthly_repeat_rates = {}
-        for month, group in repeat_with_month.groupby('年月'):
-            total = len(group)
-            repeaters = len(group[group['リピート回数'] >= 1])
-            rate = (repeaters / total * 100) if total > 0 else 0
+        for month, total, repeaters in zip(month_labels, monthly_totals.tolist(), monthly_repeaters.tolist()):
+            if total == 0:
+                continue
+            rate = repeaters / total * 100
             
-            monthly_repeat_rates[str(month)] = {
+            monthly_repeat_rates[month] = {
                 'new_customers': total,
                 'repeaters': repeaters,
                 'repeat_rate': round(rate, 1)
             }
         
         return {
-            'monthly_new_customers': {str(k): v for k, v in monthly_new.items()},
+            'monthly_new_customers': dict(zip(month_labels, monthly_new.tolist())),
             'monthly_repeat_rates': monthly_repeat_rates
-        } 
\ No newline at end of file
+        }
@@ -6,7 +6,7 @@ import pandas as pd
 from datetime import datetime
 import os
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, BinaryIO
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +17,27 @@ class ReportGenerator:
         self.reports_dir = 'reports'
         os.makedirs(self.reports_dir, exist_ok=True)
     
-    def generate_text_report(self, analysis_results: Dict, parameters: Dict) -> str:
+    def generate_text_report(self, analysis_results: Dict, parameters: Dict,
+                             output: Optional[BinaryIO] = None) -> Optional[str]:
         """
         テキストレポートを生成
         
         Args:
             analysis_results: 分析結果辞書
             parameters: 分析パラメータ
+            output: 書き込み先のバイナリストリーム (io.BytesIO など)。
+                    指定した場合はファイルを作らずUTF-8で書き込む
             
         Returns:
-            生成されたレポートファイルのパス
+            生成されたレポートファイルのパス (output 指定時は None)
         """
         logger.info("テキストレポート生成開始")
         
+        if output is not None:
+            output.write(self._create_text_content(analysis_results, parameters).encode('utf-8'))
+            logger.info("テキストレポート生成完了: ストリームに出力")
+            return None
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"リピート分析レポート_{timestamp}.txt"
         filepath = os.path.join(self.reports_dir, filename)
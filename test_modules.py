@@ -466,6 +466,424 @@ def test_report_generator(repeat_data):
         traceback.print_exc()
         return False
 
+def test_frame_store():
+    """Arrow IPC形式での保存・復元のテスト (カテゴリ型を含む)"""
+    print("\n" + "=" * 50)
+    print("データフレーム保存テスト開始")
+    print("=" * 50)
+
+    try:
+        from modules.frame_store import serialize_dataframe, deserialize_dataframe
+
+        df = pd.DataFrame({
+            '顧客ID': ['PHONE_09012345678', 'NAME_スズキイチロウ', 'PHONE_09012345678'],
+            '来店日': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-02-01']),
+            'スタイリスト名': pd.Categorical(['佐藤', None, '鈴木'], categories=['佐藤', '鈴木']),
+            '売上': pd.Series([5000, 0, 7500], dtype='int32')
+        })
+        restored = deserialize_dataframe(serialize_dataframe(df))
+
+        if not restored.equals(df):
+            print("❌ 保存・復元後のデータが一致しません")
+            return False
+        print("✅ 保存・復元後のデータ一致")
+
+        if (isinstance(restored['スタイリスト名'].dtype, pd.CategoricalDtype)
+                and list(restored['スタイリスト名'].cat.categories) == ['佐藤', '鈴木']):
+            print("✅ カテゴリ型・カテゴリ順の保持OK")
+        else:
+            print(f"❌ カテゴリ型が保持されていません: {restored['スタイリスト名'].dtype}")
+            return False
+
+        return True
+
+    except Exception as e:
+        print(f"❌ データフレーム保存テスト失敗: {e}")
+        traceback.print_exc()
+        return False
+
+def test_json_provider():
+    """orjsonによるJSONプロバイダーのテスト (NumPyの値・文字列以外のキー)"""
+    print("\n" + "=" * 50)
+    print("JSONプロバイダーテスト開始")
+    print("=" * 50)
+
+    try:
+        import numpy as np
+        from flask import Flask
+        from modules.json_provider import OrjsonProvider
+
+        provider = OrjsonProvider(Flask(__name__))
+        data = {
+            'count': np.int64(3),
+            'rate': np.float32(0.5),
+            'values': np.array([1, 2, 3], dtype=np.int32),
+            7: 'int key'
+        }
+        decoded = provider.loads(provider.dumps(data))
+        expected = {'count': 3, 'rate': 0.5, 'values': [1, 2, 3], '7': 'int key'}
+
+        if decoded == expected:
+            print("✅ NumPyの値・文字列以外のキーの変換OK")
+            return True
+        print(f"❌ JSON変換結果が一致しません: {decoded}")
+        return False
+
+    except Exception as e:
+        print(f"❌ JSONプロバイダーテスト失敗: {e}")
+        traceback.print_exc()
+        return False
+
+def test_upload_flow():
+    """アップロード (202応答・処理状況の確認・内容ハッシュによる再利用) のテスト"""
+    print("\n" + "=" * 50)
+    print("アップロード処理テスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    csv_content = (
+        "来店日,ステータス,お名前,電話番号,スタイリスト名,予約時HotPepperBeautyクーポン\n"
+        "2024-01-01,済み,山田 花子,090-1234-5678,佐藤,クーポンA\n"
+        "2024-02-01,済み,山田 花子,090-1234-5678,佐藤,なし\n"
+        "2024-01-10,済み,佐藤 次郎,080-9876-5432,鈴木,クーポンB\n"
+    )
+    try:
+        import time
+        from app import app, cache, hash_csv_files, ingest_csv_files, processed_cache_keys, upload_task_key
+
+        app.config['TESTING'] = True
+        client = app.test_client()
+
+        def upload(content):
+            data = {'csv_files': [(io.BytesIO(content.encode('utf-8')), 'test.csv')]}
+            return client.post('/upload', data=data, content_type='multipart/form-data')
+
+        # 初回アップロードは202で受け付け、status_url のポーリングで完了を確認する
+        response = upload(csv_content)
+        result = response.get_json()
+        if response.status_code == 202 and result.get('status_url'):
+            print("✅ アップロード受付 (202) OK")
+        else:
+            print(f"❌ アップロード受付NG: {response.status_code} {result}")
+            return False
+
+        deadline = time.monotonic() + 30
+        while True:
+            status_response = client.get(result['status_url'])
+            status = status_response.get_json()
+            if status.get('state') not in ('pending', 'running') or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        if status_response.status_code == 200 and status.get('state') == 'done' and status.get('total_records') == 3:
+            print("✅ 処理状況の確認 (done) OK")
+        else:
+            print(f"❌ 処理状況の確認NG: {status_response.status_code} {status}")
+            all_tests_passed = False
+
+        # 同じ内容の再アップロードは再処理せず、200で即時に完了する
+        response = upload(csv_content)
+        result = response.get_json()
+        if response.status_code == 200 and result.get('state') == 'done' and result.get('total_records') == 3:
+            print("✅ 内容ハッシュによる再利用OK")
+        else:
+            print(f"❌ 内容ハッシュによる再利用NG: {response.status_code} {result}")
+            all_tests_passed = False
+
+        # 別の内容を再アップロードすると、前回の処理済みデータはキャッシュから削除される
+        previous_key, _ = processed_cache_keys(hash_csv_files([('test.csv', csv_content.encode('utf-8'))]))
+        upload(csv_content.replace('クーポンB', 'クーポンC'))
+        with app.app_context():
+            released = not cache.has(previous_key)
+        if released:
+            print("✅ 前回の処理済みデータの削除OK")
+        else:
+            print("❌ 前回の処理済みデータが削除されていません")
+            all_tests_passed = False
+
+        # 処理済みデータをキャッシュに保存できない場合は、完了ではなくエラーとして記録される
+        content_hash = 'test_store_failure'
+        processed_data_key, meta_key = processed_cache_keys(content_hash)
+        original_set = cache.set
+        cache.set = lambda key, value, *args, **kwargs: False if key == processed_data_key else original_set(key, value, *args, **kwargs)
+        try:
+            ingest_csv_files('test_store_failure', content_hash, [('test.csv', csv_content.encode('utf-8'))])
+        finally:
+            del cache.set
+        with app.app_context():
+            status = cache.get(upload_task_key('test_store_failure'))
+            meta = cache.get(meta_key)
+        if status and status.get('state') == 'error' and meta is None:
+            print("✅ キャッシュ保存失敗時のエラー記録OK")
+        else:
+            print(f"❌ キャッシュ保存失敗時のエラー記録NG: {status}")
+            all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ アップロード処理テスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+
+    return all_tests_passed
+
+def test_name_normalization():
+    """氏名の正規化のテスト (半角カタカナの氏名を全角の氏名と同じ顧客として扱う)"""
+    print("\n" + "=" * 50)
+    print("氏名正規化テスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    csv_content = (
+        "来店日,ステータス,お名前,電話番号\n"
+        "2024-01-01,済み,ｽｽﾞｷ ｲﾁﾛｳ,\n"
+        "2024-02-01,済み,スズキ　イチロウ,\n"
+        "2024-03-01,済み,ﾀﾞｲｺﾞ ﾊﾟﾝ,\n"
+    )
+    temp_file = None
+    try:
+        temp_file = create_temp_csv_file(csv_content, encoding='utf-8')
+        df = DataProcessor().load_and_combine_csv_files([temp_file])
+
+        # 半角カタカナ (濁点・半濁点付きを含む) と全角カタカナの氏名は同じ顧客として扱われること
+        suzuki_ids = df.loc[df['お名前'].str.contains('ｽｽﾞｷ|スズキ'), '顧客ID'].unique()
+        if len(suzuki_ids) == 1 and suzuki_ids[0] == 'NAME_スズキイチロウ':
+            print("✅ 半角カタカナ氏名の正規化OK")
+        else:
+            print(f"❌ 半角カタカナ氏名の正規化NG: {list(suzuki_ids)}")
+            all_tests_passed = False
+
+        daigo_ids = df.loc[df['お名前'].str.contains('ﾀﾞｲｺﾞ'), '顧客ID'].tolist()
+        if daigo_ids == ['NAME_ダイゴパン']:
+            print("✅ 濁点・半濁点の結合OK")
+        else:
+            print(f"❌ 濁点・半濁点の結合NG: {daigo_ids}")
+            all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ 氏名正規化テスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+    finally:
+        if temp_file and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return all_tests_passed
+
+def test_phone_column_types():
+    """電話番号カラムのテスト (数字のみの電話番号も文字列として読み込み、先頭の0を保持する)"""
+    print("\n" + "=" * 50)
+    print("電話番号読み込みテスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    # 数字のみの電話番号とハイフン付きの電話番号は、別ファイルにあっても同じ顧客として扱われること
+    csv_content_digits = (
+        "来店日,ステータス,お名前,電話番号\n"
+        "2024-01-05,済み,山田 花子,09012345678\n"
+        "2024-02-05,済み,山田 花子,09012345678\n"
+    )
+    csv_content_hyphen = (
+        "来店日,ステータス,お名前,電話番号\n"
+        "2024-03-05,済み,山田 花子,090-1234-5678\n"
+    )
+    temp_files = []
+    try:
+        temp_files.append(create_temp_csv_file(csv_content_digits, encoding='utf-8'))
+        temp_files.append(create_temp_csv_file(csv_content_hyphen, encoding='utf-8'))
+        df = DataProcessor().load_and_combine_csv_files(temp_files)
+
+        customer_ids = df['顧客ID'].astype(str).unique().tolist()
+        if customer_ids == ['PHONE_09012345678']:
+            print("✅ 電話番号の文字列読み込みOK")
+        else:
+            print(f"❌ 電話番号の文字列読み込みNG: {customer_ids}")
+            all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ 電話番号読み込みテスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+    finally:
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    return all_tests_passed
+
+def test_ranking_order():
+    """スタイリスト別・クーポン別ランキングの並び順のテスト (同率時は名前順)"""
+    print("\n" + "=" * 50)
+    print("ランキング順序テスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    try:
+        analyzer = RepeatAnalyzer()
+        expected_stylists = [' 田中', '不明', '佐藤', '鈴木', '田中']
+        expected_coupons = ['A券', 'M券', 'Z券', 'なし']
+
+        def build_repeat_df(categorical, reverse=False):
+            repeat_df = pd.DataFrame({
+                'スタイリスト名': ['佐藤', '佐藤', None, '', ' 田中', '田中', '鈴木', '鈴木'],
+                '初回クーポン': ['Z券', 'Z券', 'A券', 'A券', 'M券', 'M券', None, None],
+                'リピート回数': [1, 0, 1, 0, 1, 0, 2, 0]
+            })
+            if categorical:
+                # Arrowの辞書型から復元したカテゴリのように、名前順でないカテゴリ順を与える
+                repeat_df['スタイリスト名'] = pd.Categorical(repeat_df['スタイリスト名'], categories=['鈴木', '佐藤', '', ' 田中', '田中'])
+                repeat_df['初回クーポン'] = pd.Categorical(repeat_df['初回クーポン'], categories=['Z券', 'M券', 'A券'])
+            if reverse:
+                repeat_df = repeat_df.iloc[::-1].reset_index(drop=True)
+            return repeat_df
+
+        for categorical in (False, True):
+            for reverse in (False, True):
+                label = f"categorical={categorical}, reverse={reverse}"
+                repeat_df = build_repeat_df(categorical, reverse)
+                stylist_result = analyzer._analyze_by_stylist(repeat_df, 1, 1)
+                coupon_result = analyzer._analyze_by_coupon(repeat_df, 1, 1)
+                stylists = [stat['stylist_name'] for stat in stylist_result['stylist_stats']]
+                coupons = [stat['coupon_name'] for stat in coupon_result['coupon_stats']]
+
+                if stylists == expected_stylists:
+                    print(f"✅ スタイリストランキング順OK ({label})")
+                else:
+                    print(f"❌ スタイリストランキング順NG ({label}): {stylists}")
+                    all_tests_passed = False
+
+                if coupons == expected_coupons:
+                    print(f"✅ クーポンランキング順OK ({label})")
+                else:
+                    print(f"❌ クーポンランキング順NG ({label}): {coupons}")
+                    all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ ランキング順序テスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+
+    return all_tests_passed
+
+def test_csv_quoted_newlines():
+    """CSV読み込みのテスト (引用符内の改行・列数が足りない行)"""
+    print("\n" + "=" * 50)
+    print("CSV読み込みテスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    header = "来店日,ステータス,お名前,電話番号,予約時メニュー\n"
+    # 引用符内に改行を含むメニュー欄が、パースのブロック (block_size) の境界をまたぐようにする
+    csv_content_multiline = header + "".join(
+        f'2024-01-{i % 28 + 1:02d},済み,顧客{i},090{i:08d},"カット\nカラー{i}"\n' for i in range(200)
+    )
+    # 列数が足りない行は、pandas.read_csv と同じく不足分を欠損値として読み込む
+    csv_content_short_row = header + (
+        "2024-01-01,済み,山田 花子,090-1234-5678,カット\n"
+        "2024-01-02,済み,佐藤 次郎\n"
+    )
+    temp_files = []
+    try:
+        temp_files.append(create_temp_csv_file(csv_content_multiline, encoding='utf-8'))
+        df = DataProcessor(block_size=1024).load_and_combine_csv_files([temp_files[-1]])
+        if len(df) == 200 and (df['予約時メニュー'] == 'カット\nカラー199').any():
+            print("✅ 引用符内の改行を含むCSVの読み込みOK")
+        else:
+            print(f"❌ 引用符内の改行を含むCSVの読み込みNG: {len(df)}件")
+            all_tests_passed = False
+
+        temp_files.append(create_temp_csv_file(csv_content_short_row, encoding='utf-8'))
+        df = DataProcessor().load_and_combine_csv_files([temp_files[-1]])
+        short_row = df[df['お名前'] == '佐藤 次郎']
+        if len(df) == 2 and len(short_row) == 1 and short_row['予約時メニュー'].isna().all():
+            print("✅ 列数が足りない行の読み込みOK")
+        else:
+            print(f"❌ 列数が足りない行の読み込みNG: {len(df)}件")
+            all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ CSV読み込みテスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+    finally:
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    return all_tests_passed
+
+def test_numeric_downcast():
+    """数値カラムの型縮小のテスト (float32 で値が変わる場合は縮小しない)"""
+    print("\n" + "=" * 50)
+    print("数値型縮小テスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    try:
+        processor = DataProcessor()
+        df = processor._downcast_numeric_columns(pd.DataFrame({
+            '予約時合計金額': [10000.3, 5000.0, None],
+            '売上': [5000.0, 7500.0, None]
+        }))
+        if df['予約時合計金額'].tolist()[:2] == [10000.3, 5000.0] and df['売上'].dtype == 'float32':
+            print("✅ 浮動小数点カラムの縮小OK (誤差の出るカラムは float64 のまま)")
+        else:
+            print(f"❌ 浮動小数点カラムの縮小NG: {df.dtypes.to_dict()} {df['予約時合計金額'].tolist()}")
+            all_tests_passed = False
+
+        analyzer = RepeatAnalyzer()
+        repeat_df = analyzer._downcast_repeat_data(pd.DataFrame({
+            'リピート回数': [2, 0, 1],
+            '初回リピート日数': [0.1, None, 30.0]
+        }))
+        if repeat_df['初回リピート日数'].tolist()[0] == 0.1 and repeat_df['リピート回数'].dtype == 'int8':
+            print("✅ リピートデータの縮小OK")
+        else:
+            print(f"❌ リピートデータの縮小NG: {repeat_df.dtypes.to_dict()} {repeat_df['初回リピート日数'].tolist()}")
+            all_tests_passed = False
+
+    except Exception as e:
+        print(f"❌ 数値型縮小テスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+
+    return all_tests_passed
+
+def test_encoding_fallback():
+    """エンコーディングの再試行のテスト (デコード失敗のみ次のエンコーディングを試す)"""
+    print("\n" + "=" * 50)
+    print("エンコーディング再試行テスト開始")
+    print("=" * 50)
+
+    all_tests_passed = True
+    header = "来店日,ステータス,お名前,電話番号\n"
+    try:
+        processor = DataProcessor()
+
+        # 先頭部分 (エンコーディング検出の対象) はUTF-8で、後半に Shift_JIS の値が混ざったファイルは、
+        # どのエンコーディングでもデコードできないため例外にせず読み込み失敗 (None) とする
+        ascii_rows = "".join(f"2024-01-01,done,customer{i},090{i:08d}\n" for i in range(2000))
+        mixed_data = (header + ascii_rows).encode('utf-8') + "2024-02-01,済み,山田 花子,090-1234-5678\n".encode('cp932')
+        if processor._load_single_csv(('mixed.csv', mixed_data)) is None:
+            print("✅ デコードできないファイルの再試行OK")
+        else:
+            print("❌ デコードできないファイルが読み込まれました")
+            all_tests_passed = False
+
+        # 引用符が閉じていないなど、デコードの問題ではないエラーは別のエンコーディングで再試行せずに送出する
+        broken_data = (header + '2024-01-01,済み,"山田 花子,090-1234-5678\n').encode('utf-8')
+        try:
+            processor._load_single_csv(('broken.csv', broken_data))
+            print("❌ 構造の壊れたCSVがエラーになりません")
+            all_tests_passed = False
+        except pd.errors.ParserError:
+            print("✅ 構造の壊れたCSVのエラー送出OK")
+
+    except Exception as e:
+        print(f"❌ エンコーディング再試行テスト失敗: {e}")
+        traceback.print_exc()
+        all_tests_passed = False
+
+    return all_tests_passed
+
 def main():
     """メインテスト関数"""
     print("美容室リピート分析システム - 包括的テスト")
@@ -492,7 +910,16 @@ def main():
         ("データプロセッサ", processed_df is not None and not processed_df.empty), # 成功条件を明確化
         ("リピート分析", repeat_data is not None),
         ("可視化", viz_success),
-        ("レポート生成", report_success)
+        ("レポート生成", report_success),
+        ("データフレーム保存", test_frame_store()),
+        ("JSONプロバイダー", test_json_provider()),
+        ("アップロード処理", test_upload_flow()),
+        ("氏名正規化", test_name_normalization()),
+        ("電話番号読み込み", test_phone_column_types()),
+        ("ランキング順序", test_ranking_order()),
+        ("CSV読み込み", test_csv_quoted_newlines()),
+        ("数値型縮小", test_numeric_downcast()),
+        ("エンコーディング再試行", test_encoding_fallback())
     ]
     
     passed_count = sum(1 for _, success in results if success)
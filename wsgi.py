@@ -0,0 +1,9 @@
+"""
+WSGIエントリーポイント - gunicornなどのWSGIサーバーから読み込むアプリケーション
+
+起動: gunicorn -c gunicorn.conf.py (wsgi:app は gunicorn.conf.py の wsgi_app で指定)
+"""
+
+from app import app
+
+__all__ = ['app']